@@ -0,0 +1,236 @@
+"""
+LLM gateway benchmark against a local mock OpenAI-compatible server.
+
+Starts a chat-completions server on localhost that answers after ``--latency``
+seconds and returns 429 (with Retry-After) once more than ``--capacity``
+requests are in progress. ``--requests`` requests from ``--clients`` threads
+(or tasks with ``--async``) are sent once with a new connection per request and
+no client-side limits ("direct", like one client per LLM object), and once
+through the shared LLMGateway. ``--duplicates`` is the share of requests with an
+identical temperature-0 prompt. Throttled requests are retried after
+Retry-After, as the OpenAI SDK does.
+
+The report has wall time, requests per second, the 429s the server sent, the
+requests and TCP connections the server saw, and the gateway's own stats.
+
+Usage: python benchmarks/gateway.py [--requests 200] [--clients 32]
+                                    [--latency 0.05] [--capacity 8]
+                                    [--duplicates 0.25] [--rpm 0] [--async]
+                                    [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow_common.gateway import LLMGateway  # noqa: E402
+
+MAX_ATTEMPTS = 6
+
+
+# Mock Server
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, latency: float, capacity: int):
+        super().__init__(("127.0.0.1", 0), MockHandler)
+        self.latency = latency
+        self.capacity = capacity
+        self.active = 0
+        self.requests = 0
+        self.throttled = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def reset(self) -> None:
+        with self.lock:
+            self.requests = self.throttled = self.connections = 0
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so pooled clients can reuse the connection
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def reply(self, status: int, body: dict, headers: dict = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            over = server.active >= server.capacity
+            if over:
+                server.throttled += 1
+            else:
+                server.active += 1
+        if over:
+            self.reply(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {"Retry-After": "0.2"})
+            return
+        try:
+            time.sleep(server.latency)
+            prompt = payload["messages"][-1]["content"]
+            self.reply(200, {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": f"Answer to: {prompt}"}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 8, "total_tokens": len(prompt) // 4 + 8},
+            })
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+# Workload
+def make_payloads(count: int, duplicates: float) -> list:
+    rng = random.Random(0)
+    return [
+        {"model": "mock", "temperature": 0,
+         "messages": [{"role": "user", "content": "Summarise chapter 1" if rng.random() < duplicates else f"Question {i}"}]}
+        for i in range(count)
+    ]
+
+
+def retry_delay(response: httpx.Response) -> float:
+    return float(response.headers.get("retry-after") or 0.5)
+
+
+def send(client, url: str, payload: dict) -> int:
+    for attempt in range(MAX_ATTEMPTS):
+        response = client.post(url, json=payload) if client else httpx.post(url, json=payload)
+        if response.status_code != 429:
+            return response.status_code
+        time.sleep(retry_delay(response))
+    return response.status_code
+
+
+async def asend(client, url: str, payload: dict) -> int:
+    for attempt in range(MAX_ATTEMPTS):
+        if client:
+            response = await client.post(url, json=payload)
+        else:
+            async with httpx.AsyncClient() as fresh:
+                response = await fresh.post(url, json=payload)
+        if response.status_code != 429:
+            return response.status_code
+        await asyncio.sleep(retry_delay(response))
+    return response.status_code
+
+
+def run_threads(client, url: str, payloads: list, clients: int) -> list:
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return list(pool.map(lambda payload: send(client, url, payload), payloads))
+
+
+async def run_tasks(client, url: str, payloads: list, clients: int) -> list:
+    slots = asyncio.Semaphore(clients)
+
+    async def one(payload: dict) -> int:
+        async with slots:
+            return await asend(client, url, payload)
+
+    return await asyncio.gather(*(one(payload) for payload in payloads))
+
+
+def measure(server: MockServer, gateway, payloads: list, args) -> dict:
+    url = server.url + "/chat/completions"
+    server.reset()
+    start = time.perf_counter()
+    if args.use_async:
+        async def main():
+            client = gateway.async_client() if gateway else None
+            try:
+                return await run_tasks(client, url, payloads, args.clients)
+            finally:
+                if client:
+                    await client.aclose()
+        statuses = asyncio.run(main())
+    else:
+        client = gateway.client() if gateway else None
+        statuses = run_threads(client, url, payloads, args.clients)
+    wall = time.perf_counter() - start
+    result = {
+        "mode": "gateway" if gateway else "direct",
+        "wall_s": wall,
+        "rps": len(payloads) / wall,
+        "failed": sum(status != 200 for status in statuses),
+        "server_requests": server.requests,
+        "server_429s": server.throttled,
+        "server_connections": server.connections,
+    }
+    if gateway:
+        result.update({f"gateway_{k}": v for k, v in gateway.stats().items()})
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--duplicates", type=float, default=0.25)
+    parser.add_argument("--rpm", type=float, default=0)
+    parser.add_argument("--async", dest="use_async", action="store_true")
+    parser.add_argument("--json")
+    args = parser.parse_args()
+
+    server = MockServer(args.latency, args.capacity)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    payloads = make_payloads(args.requests, args.duplicates)
+    try:
+        results = [
+            measure(server, None, payloads, args),
+            measure(server, LLMGateway(rpm=args.rpm, max_concurrency=args.clients), payloads, args),
+        ]
+    finally:
+        server.shutdown()
+
+    for result in results:
+        print(
+            f"{result['mode']:8s} {result['wall_s']:6.2f}s {result['rps']:7.1f} req/s"
+            f"  failed={result['failed']}  server: requests={result['server_requests']}"
+            f" 429s={result['server_429s']} connections={result['server_connections']}"
+        )
+    gateway_stats = {k: v for k, v in results[1].items() if k.startswith("gateway_")}
+    print(f"gateway stats: {gateway_stats}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
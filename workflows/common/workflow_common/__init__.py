@@ -0,0 +1 @@
+"""Infrastructure shared by the workflows in this repository."""
@@ -0,0 +1,406 @@
+"""
+Process-wide gateway for OpenAI-compatible HTTP traffic.
+
+The gateway plugs into the OpenAI SDK as an httpx transport (through the
+``http_client`` / ``http_async_client`` arguments of the LLM classes), so every
+LLM object shares one keep-alive connection pool, one set of client-side
+RPM/TPM limits and one adaptive concurrency limit.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache, partial
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from workflow_common.tracing import percentile
+
+# (status, headers, raw body) of a buffered response, shared with coalesced requests
+Snapshot = Tuple[int, List[Tuple[str, str]], bytes]
+
+
+# Rate Limits
+class RateBucket:
+    """Token bucket refilled at ``per_minute`` units per minute; 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def take(self, amount: float) -> float:
+        """Takes amount and returns 0, or returns the seconds to wait before trying again."""
+        if not self.per_minute:
+            return 0.0
+        now = time.monotonic()
+        self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+        # A request larger than the whole bucket waits for a full bucket
+        amount = min(amount, self.per_minute)
+        if self.level >= amount:
+            self.level -= amount
+            return 0.0
+        return (amount - self.level) * 60 / self.per_minute
+
+
+# Gateway
+class LLMGateway:
+    """
+    Admission control, request coalescing and metrics for LLM HTTP requests.
+
+    At most ``limit`` requests are in flight. The limit halves on a 429 response
+    (and admissions pause for its Retry-After), shrinks while latency is above
+    ``target_latency``, and otherwise grows by about one per ``limit``
+    successful requests, between ``min_concurrency`` and ``max_concurrency``.
+    Identical non-streaming requests that are in flight at the same time are
+    sent once; only deterministic ones (temperature 0) unless
+    ``coalesce_nondeterministic``. A streamed request holds its slot until its
+    body is closed.
+    """
+
+    def __init__(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        target_latency: float = 0.0,
+        max_connections: int = 32,
+        keepalive_expiry: float = 60.0,
+        coalesce_nondeterministic: bool = False,
+    ):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency = target_latency
+        self.coalesce_nondeterministic = coalesce_nondeterministic
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.latencies: deque = deque(maxlen=1000)
+        self._requests = RateBucket(rpm)
+        self._tokens = RateBucket(tpm)
+        self._paused_until = 0.0
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._transport = httpx.HTTPTransport(limits=self.limits)
+        # The async pool is tied to the event loop it was created in
+        self._async_transports: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_env(cls) -> "LLMGateway":
+        return cls(
+            rpm=float(os.getenv("LLM_GATEWAY_RPM") or 0),
+            tpm=float(os.getenv("LLM_GATEWAY_TPM") or 0),
+            max_concurrency=int(os.getenv("LLM_GATEWAY_MAX_CONCURRENCY") or 16),
+            target_latency=float(os.getenv("LLM_GATEWAY_TARGET_LATENCY") or 0),
+            max_connections=int(os.getenv("LLM_GATEWAY_MAX_CONNECTIONS") or 32),
+            coalesce_nondeterministic=os.getenv("LLM_GATEWAY_COALESCE_NONDETERMINISTIC", "").lower() in ("1", "true", "yes"),
+        )
+
+    # Clients
+    def client(self, timeout: float = 600.0) -> httpx.Client:
+        return httpx.Client(transport=GatewayTransport(self), timeout=timeout)
+
+    def async_client(self, timeout: float = 600.0) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=AsyncGatewayTransport(self), timeout=timeout)
+
+    def async_transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._async_transports.get(loop)
+            if transport is None:
+                transport = self._async_transports[loop] = httpx.AsyncHTTPTransport(limits=self.limits)
+        return transport
+
+    # Request Inspection
+    def describe(self, request: httpx.Request, body: bytes) -> Tuple[Optional[str], bool, int]:
+        """(coalescing key or None, streaming, estimated tokens) of a request."""
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            payload = {}
+        if not isinstance(payload, dict):
+            payload = {}
+        stream = bool(payload.get("stream"))
+        text = json.dumps(payload.get("messages") or payload.get("prompt") or "")
+        # About four characters per token, plus the completion budget
+        tokens = len(text) // 4 + int(payload.get("max_tokens") or payload.get("max_completion_tokens") or 256)
+        # The API samples at temperature 1 when none is sent
+        deterministic = payload.get("temperature", 1) == 0
+        if request.method != "POST" or stream or not (deterministic or self.coalesce_nondeterministic):
+            return None, stream, tokens
+        digest = hashlib.sha256()
+        for part in (request.url.path, request.headers.get("authorization", ""), body):
+            digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+            digest.update(b"\0")
+        return digest.hexdigest(), stream, tokens
+
+    # Coalescing
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """Returns the shared future for key and whether the caller should send the request."""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._pending[key] = Future()
+            return future, True
+
+    def leave(self, key: str) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+
+    # Admission Control
+    def try_admit(self, tokens: int) -> float:
+        """Admits a request (returns 0) or returns the seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.in_flight >= max(self.min_concurrency, int(self.limit)):
+                return 0.01
+            wait = self._requests.take(1)
+            if wait:
+                return wait
+            wait = self._tokens.take(tokens)
+            if wait:
+                # Give the request slot back; both are taken again on the next try
+                self._requests.level += 1
+                return wait
+            self.in_flight += 1
+            self.requests += 1
+            return 0.0
+
+    def admit(self, tokens: int) -> None:
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                wait = self.try_admit(tokens)
+                if not wait:
+                    return
+                time.sleep(min(wait, 0.05))
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    async def aadmit(self, tokens: int) -> None:
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                wait = self.try_admit(tokens)
+                if not wait:
+                    return
+                await asyncio.sleep(min(wait, 0.05))
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def release(self, status: Optional[int], latency: float, retry_after: Optional[str] = None) -> None:
+        """Frees the request's slot and adapts the concurrency limit to the outcome."""
+        with self._lock:
+            self.in_flight -= 1
+            if status == 429:
+                self.throttled += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                try:
+                    pause = float(retry_after) if retry_after else 1.0
+                except ValueError:
+                    pause = 1.0
+                self._paused_until = max(self._paused_until, time.monotonic() + min(pause, 60.0))
+                return
+            if status is None or status >= 500:
+                return
+            self.latencies.append(latency)
+            if self.target_latency and latency > self.target_latency:
+                self.limit = max(self.min_concurrency, self.limit * 0.9)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    # Metrics
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = list(self.latencies)
+            return {
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "throttled": self.throttled,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "concurrency_limit": round(self.limit, 2),
+                "p50_s": percentile(latencies, 0.5),
+                "p95_s": percentile(latencies, 0.95),
+            }
+
+    def export_metrics(self, tracer) -> None:
+        """Copies the gateway's gauges into a tracer's Prometheus output."""
+        for name, value in self.stats().items():
+            tracer.set_gauge(f"llm_gateway_{name}", value)
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+def snapshot_response(snapshot: Snapshot, request: httpx.Request) -> httpx.Response:
+    status, headers, content = snapshot
+    # The body is still encoded as sent, so the client decodes it as usual
+    return httpx.Response(status, headers=headers, content=content, request=request)
+
+
+# Streamed Bodies
+class ReleasingStream(httpx.SyncByteStream):
+    """Body of a streamed response that frees the gateway slot once it is closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release: Optional[Callable[[], None]] = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release: Optional[Callable[[], None]] = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+# Transports
+class GatewayTransport(httpx.BaseTransport):
+    def __init__(self, gateway: LLMGateway):
+        self.gateway = gateway
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        gateway = self.gateway
+        key, stream, tokens = gateway.describe(request, request.read())
+        future = None
+        if key is not None:
+            future, leader = gateway.join(key)
+            if not leader:
+                return snapshot_response(future.result(), request)
+        try:
+            gateway.admit(tokens)
+            started, status, retry_after, held = time.monotonic(), None, None, False
+            try:
+                response = gateway._transport.handle_request(request)
+                status, retry_after = response.status_code, response.headers.get("retry-after")
+                if stream:
+                    # The slot stays taken until the body is closed; latency is time to headers
+                    response.stream = ReleasingStream(
+                        response.stream, partial(gateway.release, status, time.monotonic() - started, retry_after)
+                    )
+                    held = True
+                    return response
+                try:
+                    snapshot = (status, response.headers.multi_items(), b"".join(response.iter_raw()))
+                finally:
+                    response.close()
+            finally:
+                if not held:
+                    gateway.release(status, time.monotonic() - started, retry_after)
+            if future is not None:
+                future.set_result(snapshot)
+            return snapshot_response(snapshot, request)
+        except BaseException as e:
+            if future is not None and not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            if key is not None:
+                gateway.leave(key)
+
+
+class AsyncGatewayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, gateway: LLMGateway):
+        self.gateway = gateway
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        gateway = self.gateway
+        key, stream, tokens = gateway.describe(request, await request.aread())
+        future = None
+        if key is not None:
+            future, leader = gateway.join(key)
+            if not leader:
+                return snapshot_response(await asyncio.wrap_future(future), request)
+        try:
+            await gateway.aadmit(tokens)
+            started, status, retry_after, held = time.monotonic(), None, None, False
+            try:
+                response = await gateway.async_transport().handle_async_request(request)
+                status, retry_after = response.status_code, response.headers.get("retry-after")
+                if stream:
+                    response.stream = AsyncReleasingStream(
+                        response.stream, partial(gateway.release, status, time.monotonic() - started, retry_after)
+                    )
+                    held = True
+                    return response
+                try:
+                    chunks = [chunk async for chunk in response.aiter_raw()]
+                    snapshot = (status, response.headers.multi_items(), b"".join(chunks))
+                finally:
+                    await response.aclose()
+            finally:
+                if not held:
+                    gateway.release(status, time.monotonic() - started, retry_after)
+            if future is not None:
+                future.set_result(snapshot)
+            return snapshot_response(snapshot, request)
+        except BaseException as e:
+            if future is not None and not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            if key is not None:
+                gateway.leave(key)
+
+
+@lru_cache(maxsize=None)
+def get_gateway() -> LLMGateway:
+    """Returns the process-wide gateway, configured from the LLM_GATEWAY_* variables."""
+    return LLMGateway.from_env()
+
+
+@lru_cache(maxsize=None)
+def get_http_client() -> httpx.Client:
+    return get_gateway().client()
+
+
+@lru_cache(maxsize=None)
+def get_async_http_client() -> httpx.AsyncClient:
+    return get_gateway().async_client()
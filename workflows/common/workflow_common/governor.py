@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+# RunGovernor of the run in progress, charged by the tracers for every LLM call
+current_governor: ContextVar[Optional["RunGovernor"]] = ContextVar("current_governor", default=None)
+
+
+@dataclass
+class Budget:
+    """Per-run limits; 0 means unlimited. Cost needs the per-1k-token prices."""
+
+    max_tokens: int = 0
+    max_seconds: float = 0.0
+    max_llm_calls: int = 0
+    max_cost_usd: float = 0.0
+    # How often the loop may come back to an identical state; 0 turns detection off
+    max_repeats: int = 2
+    prompt_price_per_1k: float = 0.0
+    completion_price_per_1k: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> "Budget":
+        max_repeats = os.getenv("RUN_MAX_REPEATS")
+        return cls(
+            max_tokens=int(os.getenv("RUN_MAX_TOKENS") or 0),
+            max_seconds=float(os.getenv("RUN_MAX_SECONDS") or 0),
+            max_llm_calls=int(os.getenv("RUN_MAX_LLM_CALLS") or 0),
+            max_cost_usd=float(os.getenv("RUN_MAX_COST_USD") or 0),
+            max_repeats=2 if max_repeats is None else int(max_repeats),
+            prompt_price_per_1k=float(os.getenv("LLM_PROMPT_PRICE_PER_1K") or 0),
+            completion_price_per_1k=float(os.getenv("LLM_COMPLETION_PRICE_PER_1K") or 0),
+        )
+
+
+# Run Governor
+class RunGovernor:
+    """
+    Tracks one run's LLM usage against a Budget and detects non-progress cycles.
+
+    While active(), every LLM call the tracer records in this context is
+    charged here. The workflow calls check() before each step with the parts
+    that define the step (e.g. the next agent and the state, or the sender and
+    its message); it returns why the run should stop, or None. Once a reason is
+    returned, stop_reason keeps it.
+    """
+
+    def __init__(self, budget: Optional[Budget] = None):
+        self.budget = budget or Budget.from_env()
+        self.started = time.monotonic()
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.stop_reason: Optional[str] = None
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def active(self):
+        token = current_governor.set(self)
+        try:
+            yield self
+        finally:
+            current_governor.reset(token)
+
+    def charge(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost_usd += (
+                prompt_tokens * self.budget.prompt_price_per_1k + completion_tokens * self.budget.completion_price_per_1k
+            ) / 1000
+
+    def budget_exceeded(self) -> Optional[str]:
+        budget = self.budget
+        with self._lock:
+            tokens = self.prompt_tokens + self.completion_tokens
+            if budget.max_tokens and tokens >= budget.max_tokens:
+                return f"token budget reached ({tokens} of {budget.max_tokens})"
+            if budget.max_llm_calls and self.llm_calls >= budget.max_llm_calls:
+                return f"LLM call budget reached ({self.llm_calls} of {budget.max_llm_calls})"
+            if budget.max_cost_usd and self.cost_usd >= budget.max_cost_usd:
+                return f"cost budget reached (${self.cost_usd:.4f} of ${budget.max_cost_usd:.4f})"
+        elapsed = time.monotonic() - self.started
+        if budget.max_seconds and elapsed >= budget.max_seconds:
+            return f"time budget reached ({elapsed:.0f}s of {budget.max_seconds:.0f}s)"
+        return None
+
+    def check(self, *step: Any) -> Optional[str]:
+        reason = self.budget_exceeded()
+        if reason is None and step and self.budget.max_repeats:
+            key = hashlib.sha256(json.dumps(step, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+            with self._lock:
+                seen = self._seen[key] = self._seen.get(key, 0) + 1
+            if seen > self.budget.max_repeats:
+                reason = f"no progress, the same step came up {seen} times"
+        if reason is not None and self.stop_reason is None:
+            self.stop_reason = reason
+        return reason
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "llm_calls": self.llm_calls,
+                "tokens": self.prompt_tokens + self.completion_tokens,
+                "cost_usd": round(self.cost_usd, 6),
+                "seconds": round(time.monotonic() - self.started, 3),
+                "stop_reason": self.stop_reason,
+                "budget": asdict(self.budget),
+            }
@@ -0,0 +1,220 @@
+"""
+Span tracing shared by the workflows: per-agent latency, tokens, retries and
+cache hits, a JSONL span log and a Prometheus textfile.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from workflow_common.governor import current_governor
+
+# Name of the agent step currently running, used to attribute LLM calls
+current_agent: ContextVar[str] = ContextVar("current_agent", default="")
+# ID of the run in progress, so spans and outputs of concurrent or consecutive runs can be told apart
+current_run: ContextVar[str] = ContextVar("current_run", default="")
+
+
+@contextmanager
+def run_scope(run_id: Optional[str] = None):
+    """Attributes spans and outputs recorded in this block to run_id (default: a new ID)."""
+    token = current_run.set(run_id or uuid.uuid4().hex)
+    try:
+        yield current_run.get()
+    finally:
+        current_run.reset(token)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """Wraps fn so it runs with a copy of the caller's context, e.g. on a thread pool."""
+    context = copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+# Tracer
+class Tracer:
+    """
+    Collects per-step spans (agent, latency, tokens, retries, cache hits).
+
+    Every span is appended to ``trace_path`` as one JSON line when set, and
+    write_prometheus() renders the aggregates in the Prometheus textfile format.
+    Spans and outputs carry the current run, so summary(run) covers one run
+    while the Prometheus counters stay cumulative for the process.
+    """
+
+    def __init__(self, trace_path: Optional[str] = None, metrics_path: Optional[str] = None, prefix: str = "workflow"):
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.prefix = prefix
+        self.spans: List[dict] = []
+        self.outputs: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, kind: str = "agent", **attributes: Any):
+        span = {
+            "name": name,
+            "kind": kind,
+            "agent": name if kind == "agent" else current_agent.get() or name,
+            "run": current_run.get(),
+            "start": time.time(),
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_tokens": 0,
+            "retries": 0,
+            "cache_hits": 0,
+            **attributes,
+        }
+        token = current_agent.set(name) if kind == "agent" else None
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["error"] = repr(e)
+            raise
+        finally:
+            span["latency_s"] = time.perf_counter() - started
+            if token is not None:
+                current_agent.reset(token)
+            self.record(span)
+
+    def record(self, span: dict) -> None:
+        governor = current_governor.get()
+        if governor is not None and span["kind"] == "llm" and not span["cache_hits"]:
+            governor.charge(span["prompt_tokens"], span["completion_tokens"])
+        with self._lock:
+            self.spans.append(span)
+            if self.trace_path:
+                with open(self.trace_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span, default=str) + "\n")
+
+    def record_retry(self) -> None:
+        agent = current_agent.get() or "unknown"
+        self.record({"name": agent, "kind": "retry", "agent": agent, "run": current_run.get(), "start": time.time(), "latency_s": 0.0,
+                     "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "retries": 1, "cache_hits": 0})
+
+    def add_outputs(self, count: int) -> None:
+        """Counts produced items (cards or charts) of the current run for the tokens-per-output figure."""
+        run = current_run.get()
+        with self._lock:
+            self.outputs[run] = self.outputs.get(run, 0) + count
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Sets a point-in-time value, e.g. the LLM gateway queue depth, exported as {prefix}_{name}."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def reset(self) -> None:
+        """Drops collected spans and outputs, e.g. between benchmark runs."""
+        with self._lock:
+            self.spans.clear()
+            self.outputs.clear()
+
+    def summary(self, run: Optional[str] = None) -> dict:
+        """Aggregates per agent, over all spans or only those of run."""
+        with self._lock:
+            spans = [span for span in self.spans if run is None or span.get("run") == run]
+            outputs = self.outputs.get(run, 0) if run is not None else sum(self.outputs.values())
+        agents: Dict[str, dict] = {}
+        for span in spans:
+            stats = agents.setdefault(span["agent"], {
+                "steps": 0, "llm_calls": 0, "latencies": [], "ttfts": [], "prompt_tokens": 0,
+                "completion_tokens": 0, "cached_tokens": 0, "retries": 0, "cache_hits": 0, "errors": 0,
+            })
+            if span["kind"] in ("agent", "tool"):
+                stats["steps"] += 1
+                stats["latencies"].append(span["latency_s"])
+            if span["kind"] == "llm":
+                stats["llm_calls"] += 1
+                # Streamed calls measure the first token; for the others it is the whole call
+                stats["ttfts"].append(span.get("ttft_s", span["latency_s"]))
+            stats["prompt_tokens"] += span["prompt_tokens"]
+            stats["completion_tokens"] += span["completion_tokens"]
+            stats["cached_tokens"] += span.get("cached_tokens", 0)
+            stats["retries"] += span["retries"]
+            stats["cache_hits"] += span["cache_hits"]
+            stats["errors"] += "error" in span
+
+        for stats in agents.values():
+            latencies = stats.pop("latencies")
+            stats["p50_s"] = percentile(latencies, 0.5)
+            stats["p95_s"] = percentile(latencies, 0.95)
+            stats["ttft_p50_s"] = percentile(stats.pop("ttfts"), 0.5)
+
+        total_tokens = sum(s["prompt_tokens"] + s["completion_tokens"] for s in agents.values())
+        prompt_tokens = sum(s["prompt_tokens"] for s in agents.values())
+        return {
+            "agents": agents,
+            "total_tokens": total_tokens,
+            # Share of prompt tokens the provider served from its prompt cache
+            "cached_ratio": sum(s["cached_tokens"] for s in agents.values()) / prompt_tokens if prompt_tokens else 0.0,
+            "outputs": outputs,
+            "tokens_per_output": total_tokens / outputs if outputs else None,
+        }
+
+    def format_summary(self, run: Optional[str] = None) -> str:
+        summary = self.summary(run)
+        lines = [f"{'agent':<30} {'steps':>5} {'llm':>5} {'p50 s':>7} {'p95 s':>7} {'ttft s':>7} {'prompt':>8} {'cached':>7} {'compl':>7} {'retry':>5} {'cache':>5}"]
+        for name, s in sorted(summary["agents"].items()):
+            lines.append(
+                f"{name:<30} {s['steps']:>5} {s['llm_calls']:>5} {s['p50_s']:>7.2f} {s['p95_s']:>7.2f} {s['ttft_p50_s']:>7.2f}"
+                f" {s['prompt_tokens']:>8} {s['cached_tokens']:>7} {s['completion_tokens']:>7} {s['retries']:>5} {s['cache_hits']:>5}"
+            )
+        totals = f"total tokens: {summary['total_tokens']}, cached prompt share: {summary['cached_ratio']:.0%}, outputs: {summary['outputs']}"
+        if summary["tokens_per_output"] is not None:
+            totals += f", tokens/output: {summary['tokens_per_output']:.0f}"
+        lines.append(totals)
+        return "\n".join(lines)
+
+    def write_prometheus(self, path: Optional[str] = None) -> None:
+        """Writes aggregate metrics in the Prometheus textfile-collector format."""
+        path = path or self.metrics_path
+        if not path:
+            return
+        summary = self.summary()
+        p = self.prefix
+        agents = sorted(summary["agents"].items())
+
+        def label(name: str) -> str:
+            return name.replace("\\", "\\\\").replace('"', '\\"')
+
+        # Samples of one metric family must be contiguous in the exposition format
+        lines = []
+        for metric, field in (("steps_total", "steps"), ("llm_calls_total", "llm_calls"),
+                              ("retries_total", "retries"), ("cache_hits_total", "cache_hits")):
+            lines.append(f"# TYPE {p}_{metric} counter")
+            lines += [f'{p}_{metric}{{agent="{label(n)}"}} {s[field]}' for n, s in agents]
+        lines.append(f"# TYPE {p}_tokens_total counter")
+        for kind in ("prompt", "completion", "cached"):
+            lines += [f'{p}_tokens_total{{agent="{label(n)}",type="{kind}"}} {s[kind + "_tokens"]}' for n, s in agents]
+        lines.append(f"# TYPE {p}_step_latency_seconds summary")
+        for quantile, field in (("0.5", "p50_s"), ("0.95", "p95_s")):
+            lines += [
+                f'{p}_step_latency_seconds{{agent="{label(n)}",quantile="{quantile}"}} {s[field]:.6f}'
+                for n, s in agents
+            ]
+        lines.append(f"# TYPE {p}_time_to_first_token_seconds summary")
+        lines += [f'{p}_time_to_first_token_seconds{{agent="{label(n)}",quantile="0.5"}} {s["ttft_p50_s"]:.6f}' for n, s in agents]
+        lines.append(f"# TYPE {p}_outputs_total counter")
+        lines.append(f"{p}_outputs_total {summary['outputs']}")
+        with self._lock:
+            gauges = sorted(self.gauges.items())
+        for name, value in gauges:
+            lines.append(f"# TYPE {p}_{name} gauge")
+            lines.append(f"{p}_{name} {value}")
+        # Write then rename so the collector never reads a partial file
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(path + ".tmp", path)
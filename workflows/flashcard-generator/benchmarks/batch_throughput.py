@@ -0,0 +1,45 @@
+"""
+Measures generate_anki_cards_batch throughput against FakeOpenAI.
+
+Usage: python benchmarks/batch_throughput.py [--docs 64] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+from fake_llm import FakeOpenAI  # noqa: E402
+from utils import override_shared_llm  # noqa: E402
+from main import generate_anki_cards_batch  # noqa: E402
+
+
+async def run(docs: int, max_concurrency: int, rpm_limit) -> tuple:
+    texts = [f"Document {i} about sample topics." for i in range(docs)]
+    failures = 0
+    start = time.perf_counter()
+    async for result in generate_anki_cards_batch(texts, max_concurrency=max_concurrency, rpm_limit=rpm_limit):
+        failures += result.error is not None
+    return time.perf_counter() - start, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rpm-limit", type=float, default=None)
+    args = parser.parse_args()
+
+    llm = FakeOpenAI(latency=args.latency)
+    override_shared_llm(llm)
+    print(f"{'concurrency':>12} {'seconds':>9} {'docs/s':>8} {'failures':>9}")
+    for max_concurrency in (1, 2, 4, 8, 16, 32):
+        elapsed, failures = asyncio.run(run(args.docs, max_concurrency, args.rpm_limit))
+        print(f"{max_concurrency:>12} {elapsed:>9.2f} {args.docs / elapsed:>8.1f} {failures:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Micro-benchmark for the local card parser on large synthetic card outputs.
+
+Usage: python benchmarks/card_parser.py [--cards 10000] [--stream-chunk 64]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+from card_parser import CardParser, parse_cards  # noqa: E402
+
+
+def synthetic_output(cards: int) -> str:
+    parts = ["Here are your flashcards:\n```xml\n"]
+    for i in range(cards):
+        parts.append(
+            "<card>\n"
+            f"    <question>What does `calculate_rsi` return when periods={i}?</question>\n"
+            f"    <answer>100 - (100 / (1 + rs)) for rs < {i} & gains > 0</answer>\n"
+            "    <extra>```python\nif delta < 0 and gain & mask:\n    pass\n```</extra>\n"
+            "</card>\n"
+        )
+    parts.append("```\n<card><question>Truncated?</question><answer>Yes, the output was cut")
+    return "".join(parts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", type=int, default=10000)
+    parser.add_argument("--stream-chunk", type=int, default=64)
+    args = parser.parse_args()
+
+    text = synthetic_output(args.cards)
+    print(f"input: {len(text) / 1e6:.1f} MB, {args.cards + 1} cards")
+
+    start = time.perf_counter()
+    cards, unparsed = parse_cards(text)
+    elapsed = time.perf_counter() - start
+    print(f"whole text:   {elapsed * 1000:8.1f} ms  {len(cards) / elapsed:10.0f} cards/s  unparsed={len(unparsed)}")
+
+    start = time.perf_counter()
+    stream = CardParser()
+    streamed = []
+    for i in range(0, len(text), args.stream_chunk):
+        streamed += stream.feed(text[i:i + args.stream_chunk])
+    streamed += stream.close()
+    elapsed = time.perf_counter() - start
+    print(f"streamed:     {elapsed * 1000:8.1f} ms  {len(streamed) / elapsed:10.0f} cards/s  chunk={args.stream_chunk} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark for the near-duplicate card index.
+
+Indexes N synthetic cards, then measures per-card lookup latency and how many
+perturbed copies are caught as duplicates.
+
+Usage: python benchmarks/dedup.py [--cards 200000] [--lookups 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+from dedup import DuplicateIndex  # noqa: E402
+
+SYLLABLES = "ka lo mi ra te su no ve di pa go ne ri to ma".split()
+# A few thousand pseudo-words, roughly the vocabulary of a technical deck
+WORDS = sorted({
+    "".join(random.Random(i).choices(SYLLABLES, k=random.Random(-i).randint(1, 4)))
+    for i in range(5000)
+})
+
+
+def synthetic_card(rng: random.Random) -> str:
+    question = " ".join(rng.choices(WORDS, k=rng.randint(6, 12))) + "?"
+    answer = " ".join(rng.choices(WORDS, k=rng.randint(8, 20)))
+    return f"{question} {answer}"
+
+
+def perturb(text: str, rng: random.Random) -> str:
+    words = text.split()
+    words[rng.randrange(len(words))] = words[rng.randrange(len(words))]
+    return " ".join(words).upper()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--path", default=None, help="SQLite file to persist the index to")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [synthetic_card(rng) for _ in range(args.cards)]
+    index = DuplicateIndex(args.path)
+
+    start = time.perf_counter()
+    added = sum(index.add_if_new(text) for text in texts)
+    elapsed = time.perf_counter() - start
+    print(f"indexed {added}/{args.cards} cards in {elapsed:.1f} s ({elapsed / args.cards * 1e6:.0f} us/card)")
+
+    probes = [perturb(rng.choice(texts), rng) for _ in range(args.lookups)]
+    fresh = [synthetic_card(rng) for _ in range(args.lookups)]
+
+    start = time.perf_counter()
+    caught = sum(index.find(text) is not None for text in probes)
+    elapsed = time.perf_counter() - start
+    print(f"near-duplicate lookups: {elapsed / args.lookups * 1e6:.0f} us/card, caught {caught}/{args.lookups}")
+
+    start = time.perf_counter()
+    false_hits = sum(index.find(text) is not None for text in fresh)
+    elapsed = time.perf_counter() - start
+    print(f"new-card lookups:       {elapsed / args.lookups * 1e6:.0f} us/card, flagged {false_hits}/{args.lookups}")
+
+
+if __name__ == "__main__":
+    main()
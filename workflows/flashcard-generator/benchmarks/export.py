@@ -0,0 +1,55 @@
+"""
+Measures .apkg and CSV export throughput and peak memory for growing decks.
+
+Usage: python benchmarks/export.py [--cards 1000 10000 100000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+from models import QACard  # noqa: E402
+from export import export_apkg, export_csv  # noqa: E402
+
+
+def synthetic_cards(cards: int):
+    for i in range(cards):
+        yield QACard(
+            question=f"What does `calculate_rsi` return when periods={i}?",
+            answer=f"100 - (100 / (1 + rs)) for rs < {i}",
+            extra="```python\nif delta < 0:\n    pass\n```",
+        )
+
+
+def measure(export, cards: int, path: str) -> tuple:
+    start = time.perf_counter()
+    export(synthetic_cards(cards), path)
+    elapsed = time.perf_counter() - start
+    # Separate pass, since tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    export(synthetic_cards(cards), path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6, os.path.getsize(path) / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'format':>6} {'cards':>8} {'seconds':>8} {'cards/s':>9} {'peak MB':>8} {'file MB':>8}")
+        for name, export in (("apkg", export_apkg), ("csv", export_csv)):
+            for cards in args.cards:
+                elapsed, peak, size = measure(export, cards, os.path.join(tmp, f"deck.{name}"))
+                print(f"{name:>6} {cards:>8} {elapsed:>8.2f} {cards / elapsed:>9.0f} {peak:>8.1f} {size:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
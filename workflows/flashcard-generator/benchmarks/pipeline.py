@@ -0,0 +1,154 @@
+"""
+Offline end-to-end benchmark of generate_anki_cards against FakeOpenAI.
+
+For each input size (sections) and deck size (cards per Q&A response) it reports
+wall time, LLM calls, prompt tokens (total and the largest agent step; --json
+keeps every step) and peak Python memory. LLM calls and prompt tokens are deterministic, so --baseline can flag
+regressions in loop overhead or prompt growth between commits.
+
+Usage: python benchmarks/pipeline.py [--sections 1 8 32] [--cards 5 25 100]
+                                     [--latency 0] [--transcript run.jsonl]
+                                     [--json out.json] [--baseline out.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+from fake_llm import FakeOpenAI, load_transcript  # noqa: E402
+from utils import get_tracer, override_shared_llm  # noqa: E402
+from main import generate_anki_cards  # noqa: E402
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "te", "so", "vu", "ne", "pi", "da", "gor", "lin", "tas", "mer", "quo", "zen"]
+
+
+def make_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def make_document(sections: int, rng: random.Random) -> str:
+    """Markdown with one heading and three paragraphs (~300 tokens) per section."""
+    parts = []
+    for i in range(sections):
+        parts.append(f"## Section {i}: {make_word(rng)}")
+        for _ in range(3):
+            parts.append(" ".join(make_word(rng) for _ in range(80)) + ".")
+    return "\n\n".join(parts)
+
+
+def make_deck(cards: int, rng: random.Random) -> str:
+    deck = []
+    for _ in range(cards):
+        question = " ".join(make_word(rng) for _ in range(8))
+        answer = " ".join(make_word(rng) for _ in range(12))
+        deck.append(
+            f"<card>\n    <question>What is {question}?</question>\n"
+            f"    <answer>{answer}</answer>\n    <extra></extra>\n</card>"
+        )
+    return "\n".join(deck)
+
+
+def step_prompt_tokens(spans: list) -> list:
+    """Prompt tokens sent during each agent step, in the order the steps started."""
+    steps = sorted((s for s in spans if s["kind"] == "agent"), key=lambda s: s["start"])
+    llm_calls = [s for s in spans if s["kind"] == "llm"]
+    return [
+        sum(
+            c["prompt_tokens"] for c in llm_calls
+            if c["agent"] == step["agent"] and step["start"] <= c["start"] <= step["start"] + step["latency_s"]
+        )
+        for step in steps
+    ]
+
+
+def run(sections: int, cards: int, latency: float, transcript: dict) -> dict:
+    rng = random.Random(sections * 1000 + cards)
+    text = make_document(sections, rng)
+    tracer = get_tracer()
+    tracer.reset()
+    llm = FakeOpenAI(latency=latency, cards=make_deck(cards, rng), transcript=transcript, tracer=tracer)
+    override_shared_llm(llm)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = generate_anki_cards(text, resume=False)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_step = step_prompt_tokens(tracer.spans)
+    return {
+        "sections": sections,
+        "cards": cards,
+        "seconds": elapsed,
+        "llm_calls": llm.calls,
+        "prompt_tokens": sum(s["prompt_tokens"] for s in tracer.spans),
+        "step_prompt_tokens": per_step,
+        "peak_mb": peak / 1e6,
+        "final_cards": len(result.get("cards", [])),
+    }
+
+
+def check_baseline(results: list, path: str, tolerance: float) -> list:
+    with open(path, encoding="utf-8") as f:
+        baseline = {(r["sections"], r["cards"]): r for r in json.load(f)}
+    regressions = []
+    for r in results:
+        before = baseline.get((r["sections"], r["cards"]))
+        if before is None:
+            continue
+        for metric in ("llm_calls", "prompt_tokens"):
+            if r[metric] > before[metric] * (1 + tolerance):
+                regressions.append(
+                    f"sections={r['sections']} cards={r['cards']}: {metric} {before[metric]} -> {r[metric]}"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--cards", type=int, nargs="+", default=[5, 25, 100])
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--transcript", help="JSONL transcript recorded with TRANSCRIPT_PATH")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="fail if LLM calls or prompt tokens grew past a previous --json file")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    transcript = load_transcript(args.transcript) if args.transcript else {}
+    results = []
+    print(f"{'sections':>8} {'cards':>6} {'seconds':>8} {'llm':>5} {'prompt':>8} {'steps':>6} {'max step':>9} {'peak MB':>8} {'final':>6}")
+    for sections in args.sections:
+        for cards in args.cards:
+            r = run(sections, cards, args.latency, transcript)
+            results.append(r)
+            steps = r["step_prompt_tokens"] or [0]
+            print(
+                f"{sections:>8} {cards:>6} {r['seconds']:>8.2f} {r['llm_calls']:>5} {r['prompt_tokens']:>8}"
+                f" {len(r['step_prompt_tokens']):>6} {max(steps):>9} {r['peak_mb']:>8.1f} {r['final_cards']:>6}"
+            )
+    override_shared_llm(None)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        regressions = check_baseline(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Prompt-cache benchmark: how much of each agent's prompt a provider could
+serve from its prompt cache, and the time to first token.
+
+Runs generate_anki_cards on ``--documents`` generated documents in a row. The
+Orchestrator is scripted to send the deck to the Reviewer ``--reviews`` times
+before it ends, so it is asked ``--reviews + 1`` times per document. Offline,
+FakeOpenAI simulates the provider cache (a previously sent run of leading
+messages counts as cached once it reaches ``--min-cached-tokens``) and charges
+``--prefill`` seconds per 1k uncached prompt tokens before the first token.
+With ``--live`` the configured API is called instead and its reported
+``cached_tokens`` are used; keep the run small.
+
+Per agent the report has LLM calls, prompt and cached tokens, the cached share
+and the median time to first token (the whole call for non-streamed calls).
+Run it on two commits with ``--json`` to compare prompt layouts; ``--baseline``
+fails if the overall cached share dropped by more than ``--tolerance``.
+
+Usage: python benchmarks/prompt_cache.py [--documents 4] [--sections 2]
+                                         [--cards 10] [--reviews 2]
+                                         [--min-cached-tokens 1024]
+                                         [--prefill 0.05] [--live]
+                                         [--json out.json] [--baseline out.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+# The scripted Orchestrator sends an unchanged deck back to the Reviewer on purpose
+os.environ.setdefault("RUN_MAX_REPEATS", "1000")
+
+from fake_llm import FakeOpenAI  # noqa: E402
+from utils import get_tracer, override_shared_llm  # noqa: E402
+from main import generate_anki_cards  # noqa: E402
+from pipeline import make_deck, make_document  # noqa: E402
+
+
+def run(args) -> dict:
+    rng = random.Random(0)
+    tracer = get_tracer()
+    tracer.reset()
+    llm = None
+    if not args.live:
+        decisions = (["Reviewer"] * args.reviews + ["END"]) * args.documents
+        llm = FakeOpenAI(
+            cards=make_deck(args.cards, rng),
+            transcript={"Orchestrator": decisions},
+            prefix_cache_min_tokens=args.min_cached_tokens,
+            prefill_per_1k=args.prefill,
+            tracer=tracer,
+        )
+        override_shared_llm(llm)
+
+    start = time.perf_counter()
+    for _ in range(args.documents):
+        text = make_document(args.sections, rng)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_anki_cards(text, resume=False)
+    elapsed = time.perf_counter() - start
+    override_shared_llm(None)
+
+    summary = tracer.summary()
+    agents = {
+        name: {k: s[k] for k in ("llm_calls", "prompt_tokens", "cached_tokens", "ttft_p50_s")}
+        for name, s in summary["agents"].items()
+        if s["llm_calls"]
+    }
+    return {"seconds": elapsed, "cached_ratio": summary["cached_ratio"], "agents": agents}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--sections", type=int, default=2)
+    parser.add_argument("--cards", type=int, default=10)
+    parser.add_argument("--reviews", type=int, default=2)
+    parser.add_argument("--min-cached-tokens", type=int, default=1024)
+    parser.add_argument("--prefill", type=float, default=0.05, help="seconds per 1k uncached prompt tokens")
+    parser.add_argument("--live", action="store_true", help="call the configured API instead of FakeOpenAI")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="fail if the cached share dropped below a previous --json file")
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    args = parser.parse_args()
+
+    result = run(args)
+    print(f"{'agent':<30} {'llm':>5} {'prompt':>8} {'cached':>8} {'share':>6} {'ttft s':>7}")
+    for name, s in sorted(result["agents"].items()):
+        share = s["cached_tokens"] / s["prompt_tokens"] if s["prompt_tokens"] else 0.0
+        print(
+            f"{name:<30} {s['llm_calls']:>5} {s['prompt_tokens']:>8} {s['cached_tokens']:>8}"
+            f" {share:>6.0%} {s['ttft_p50_s']:>7.3f}"
+        )
+    print(f"cached prompt share: {result['cached_ratio']:.1%}, wall time: {result['seconds']:.2f}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            before = json.load(f)["cached_ratio"]
+        if result["cached_ratio"] < before - args.tolerance:
+            print(f"REGRESSION cached prompt share {before:.1%} -> {result['cached_ratio']:.1%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,118 +1,619 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator, List, Optional
 from dotenv import load_dotenv
 from llama_index.core.llms import ChatMessage
 from utils import (
     get_initial_state, 
     setup_memory,
-    validate_and_transform
+    validate_and_transform,
+    avalidate_and_transform,
+    get_response_cache,
+    get_checkpoint_store,
+    get_section_index,
+    get_duplicate_index,
+    get_tracer
 )
 from src.agents import (
-    qa_generator_factory,
-    reviewer_factory,
-    topic_analyzer_factory,
-    code_and_extra_field_expert_factory,
-    formatter_agent_factory,
-    orchestrator_factory,
+    AgentPool,
+    borrow_agent,
+    state_message,
     Speaker
 )
+from src.scheduler import Scheduler, END
+from src.batch import TokenBucket, run_batch
+from src.chunking import split_into_chunks, merge_topics, merge_cards
+from src.card_parser import iter_cards, aiter_cards
+from src.sharding import split_card_shards, run_shards, arun_shards
+from src.checkpoint import document_key
+from workflow_common.governor import RunGovernor
+from src.incremental import split_sections, diff_sections
+from src.dedup import StreamDeduper, dedupe_deck, dedup_source
+from src.tracing import bind_context, current_run, run_scope
+from models import QACard, Flashcard_model
+from workflow_common.gateway import get_gateway
 
 # Load environment variables from the .env file
 load_dotenv()
 
 
-# Main Function
-def generate_anki_cards(input_text: str) -> dict:
+# Agent Dispatch
+def build_agent_message(next_agent: str, state: dict) -> Optional[str]:
+    """
+    Returns the message to send next_agent, or None for an unknown agent. The
+    system prompts are static; anything taken from the state goes in here.
+    """
+    if next_agent == Speaker.TOPIC_ANALYZER.value:
+        return f"Analyze this text for flashcard topics:\n\n{state['input_text']}\n\n{state_message(state)}"
+    if next_agent == Speaker.QA_GENERATOR.value:
+        return f"Generate flashcards for this topic:\n\n{state['topics']}"
+    if next_agent == Speaker.CODE_AND_EXTRA_FIELD_EXPERT.value:
+        return f"Enhance these flashcards with code examples and detailed explanations:\n\n{state['qa_cards']}"
+    if next_agent == Speaker.REVIEWER.value:
+        return f"Review these flashcards:\n\n{state['qa_cards']}"
+    if next_agent == Speaker.FORMATTER.value:
+        return f"Format these flashcards:\n\n{state['qa_cards']}"
+    return None
+
+
+def apply_agent_response(next_agent: str, state: dict, response) -> None:
+    """Updates the state with an agent's response."""
+    if next_agent == Speaker.TOPIC_ANALYZER.value:
+        state["topics"] = str(response)
+        print("\nTopic Analysis Results:")
+        print(state["topics"])
+    elif next_agent == Speaker.QA_GENERATOR.value:
+        # Drop near-duplicates before the Reviewer spends tokens on them
+        state["qa_cards"] = dedupe_deck(str(response), get_duplicate_index())
+        print("\nGenerated Cards:")
+        print(state["qa_cards"])
+    elif next_agent == Speaker.CODE_AND_EXTRA_FIELD_EXPERT.value:
+        state["qa_cards"] = str(response)
+        print("\nEnhanced Cards with Code Examples:")
+        print(state["qa_cards"])
+    elif next_agent == Speaker.REVIEWER.value:
+        state["qa_cards"] = str(response)
+        state["review_status"] = "reviewed"
+        print("\nReviewed Cards:")
+        print(state["qa_cards"])
+    elif next_agent == Speaker.FORMATTER.value:
+        state["qa_cards"] = str(response)
+        state["formatting_status"] = "completed"
+        print("\nFormatted Cards:")
+        print(state["qa_cards"])
+
+
+def init_run(input_text: str):
     # Initialize state and memory
     state = get_initial_state(input_text)
     memory = setup_memory()
     
     # Detect if input contains code
     state["has_code"] = "```" in input_text or "code" in input_text.lower()
-    
-    while True:
-        # Get current chat history
-        current_history = memory.get()
-        
-        # Let Orchestrator decide next step
-        orchestrator = orchestrator_factory(state)
-        next_agent = str(orchestrator.chat(
-            "Decide which agent to run next based on the current state.",
-            chat_history=current_history
-        )).strip().strip('"').strip("'")
+    return state, memory
+
+
+# Map-Reduce over Chunks
+def analyze_chunk(chunk: str) -> tuple:
+    """Runs topic analysis and Q&A generation on one chunk; returns (topics, cards)."""
+    state = get_initial_state(chunk)
+    for speaker in (Speaker.TOPIC_ANALYZER.value, Speaker.QA_GENERATOR.value):
+        message = build_agent_message(speaker, state)
+        with borrow_agent(speaker) as agent, get_tracer().span(speaker):
+            response = agent.chat(message)
+        apply_agent_response(speaker, state, response)
+    return state["topics"], state["qa_cards"]
+
+
+async def aanalyze_chunk(chunk: str, rate_limiter: Optional[TokenBucket] = None) -> tuple:
+    state = get_initial_state(chunk)
+    for speaker in (Speaker.TOPIC_ANALYZER.value, Speaker.QA_GENERATOR.value):
+        message = build_agent_message(speaker, state)
+        if rate_limiter is not None:
+            await rate_limiter.acquire()
+        with borrow_agent(speaker) as agent, get_tracer().span(speaker):
+            response = await agent.achat(message)
+        apply_agent_response(speaker, state, response)
+    return state["topics"], state["qa_cards"]
+
+
+def reduce_chunks(state: dict, memory, results: List[tuple]) -> None:
+    """Merges per-chunk topics and cards into the state, skipping failed chunks."""
+    results = [r for r in results if not isinstance(r, BaseException)]
+    state["topics"] = merge_topics([topics for topics, _ in results])
+    state["qa_cards"] = merge_cards([cards for _, cards in results])
+    memory.put(ChatMessage(role="assistant", content=state["topics"]), speaker=Speaker.TOPIC_ANALYZER.value)
+    memory.put(ChatMessage(role="assistant", content=state["qa_cards"]), speaker=Speaker.QA_GENERATOR.value)
+    print(f"\nMerged {len(results)} chunks")
+
+
+def map_chunks(chunks: List[str], max_workers: int) -> List[tuple]:
+    def safe_analyze(chunk):
+        try:
+            return analyze_chunk(chunk)
+        except Exception as e:
+            print(f"\nError analyzing chunk: {str(e)}")
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(bind_context(safe_analyze), chunks))
+
+
+async def amap_chunks(chunks: List[str], max_workers: int, rate_limiter: Optional[TokenBucket] = None) -> List[tuple]:
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def bounded(chunk):
+        async with semaphore:
+            return await aanalyze_chunk(chunk, rate_limiter)
+
+    results = await asyncio.gather(*(bounded(chunk) for chunk in chunks), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            print(f"\nError analyzing chunk: {str(result)}")
+    return results
+
+
+# Per-card Stages
+PER_CARD_STAGES = (
+    Speaker.REVIEWER.value,
+    Speaker.CODE_AND_EXTRA_FIELD_EXPERT.value,
+    Speaker.FORMATTER.value,
+)
+
+
+def card_shards(next_agent: str, state: dict, shard_size: int) -> Optional[List[str]]:
+    """Returns the deck split into shards when next_agent should run per shard, else None."""
+    if next_agent not in PER_CARD_STAGES:
+        return None
+    shards = split_card_shards(state["qa_cards"], shard_size)
+    return shards if len(shards) > 1 else None
+
+
+def run_card_shards(next_agent: str, state: dict, shards: List[str], max_workers: int) -> str:
+    """Runs next_agent over each shard concurrently and merges the results in deck order."""
+    def process(shard: str) -> str:
+        message = build_agent_message(next_agent, {**state, "qa_cards": shard})
+        with borrow_agent(next_agent) as agent:
+            return str(agent.chat(message))
+
+    print(f"\nRunning {next_agent} on {len(shards)} shards")
+    return "\n".join(run_shards(shards, process, max_workers=max_workers))
+
+
+async def arun_card_shards(
+    next_agent: str,
+    state: dict,
+    shards: List[str],
+    max_workers: int,
+    rate_limiter: Optional[TokenBucket] = None,
+) -> str:
+    async def process(shard: str) -> str:
+        message = build_agent_message(next_agent, {**state, "qa_cards": shard})
+        if rate_limiter is not None:
+            await rate_limiter.acquire()
+        with borrow_agent(next_agent) as agent:
+            return str(await agent.achat(message))
+
+    print(f"\nRunning {next_agent} on {len(shards)} shards")
+    return "\n".join(await arun_shards(shards, process, max_workers=max_workers))
+
+
+def report_run(scheduler: Scheduler, memory, final_cards: dict, governor: RunGovernor, agents: AgentPool) -> None:
+    print(f"\nScheduler decisions: {scheduler.stats()}")
+    print(f"\nAgents: {agents.stats()}")
+    print(f"\nRun budget: {governor.stats()}")
+    print(f"\nMemory tokens: {memory.stats()}")
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        print(f"\nLLM cache stats: {response_cache.stats()}")
+
+    tracer = get_tracer()
+    tracer.add_outputs(len(final_cards.get("cards", [])))
+    gateway = get_gateway()
+    print(f"\nLLM gateway: {gateway.stats()}")
+    gateway.export_metrics(tracer)
+    tracer.write_prometheus()
+    # Only this run's spans; the Prometheus counters above cover the whole process
+    print(f"\nAgent timings and tokens:\n{tracer.format_summary(current_run.get())}")
+
+
+# Checkpoints
+def restore_run(store, doc_key: str, state: dict, memory, scheduler: Scheduler) -> tuple:
+    """Loads the last checkpoint for doc_key into the run; returns (step, finished)."""
+    checkpoint = store.load(doc_key) if store is not None else None
+    if checkpoint is None:
+        return 0, False
+    state.update(checkpoint["state"])
+    memory.load(checkpoint["memory"])
+    scheduler.load(checkpoint["scheduler"])
+    print(f"\nResuming from step {checkpoint['step']} (last agent: {checkpoint['last_agent']})")
+    return checkpoint["step"], checkpoint["finished"]
+
+
+def save_run(store, doc_key: str, step: int, last_agent: str, state: dict, memory, scheduler: Scheduler, finished: bool = False) -> None:
+    if store is not None:
+        store.save(doc_key, step, last_agent, state, memory.dump(), scheduler.stats(), finished=finished)
+
+
+# Run Steps
+class CardRun:
+    """
+    State of one generate_anki_cards run: state, memory, scheduler, governor,
+    agents and checkpoint position. The sync and async loops share every step
+    through these methods and differ only in how they call the agents.
+    """
+
+    def __init__(
+        self,
+        input_text: str,
+        max_iterations: int,
+        resume: bool,
+        doc_id: Optional[str] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+    ):
+        self.input_text = input_text
+        self.state, self.memory = init_run(input_text)
+        self.scheduler = Scheduler(max_iterations=max_iterations, rate_limiter=rate_limiter)
+        self.governor = RunGovernor()
+        self.agents = AgentPool()
+        self.store = get_checkpoint_store()
+        self.doc_key = document_key(input_text)
+        self.source = doc_id or self.doc_key
+        self.step, self.done = restore_run(self.store, self.doc_key, self.state, self.memory, self.scheduler) if resume else (0, False)
+
+    @contextmanager
+    def active(self):
+        # LLM calls in this block are charged to the governor and traced as one run, and its agents are built once
+        with run_scope(), self.governor.active(), self.agents.active(), dedup_source(self.source):
+            yield self
+
+    def save(self, last_agent: str, finished: bool = False) -> None:
+        save_run(self.store, self.doc_key, self.step, last_agent, self.state, self.memory, self.scheduler, finished=finished)
+
+    def pending_chunks(self, max_chunk_tokens: int) -> Optional[List[str]]:
+        """Chunks to map-reduce before the loop, or None if the input fits or that step is done."""
+        chunks = split_into_chunks(self.input_text, max_tokens=max_chunk_tokens)
+        if self.step == 0 and len(chunks) > 1:
+            print(f"\nSplit input into {len(chunks)} chunks")
+            return chunks
+        return None
+
+    def reduce(self, results: List[tuple]) -> None:
+        reduce_chunks(self.state, self.memory, results)
+        self.step += 1
+        self.save("map-reduce")
+
+    def begin_step(self, next_agent: str) -> Optional[str]:
+        """
+        Returns the message to send next_agent, or None if there is nothing to
+        send. Sets done when the Orchestrator ends the run or the governor stops it.
+        """
         print(f"\nOrchestrator selected: {next_agent}")
-        
-        if next_agent == "END":
+        if next_agent == END:
             print("\nOrchestrator decided to end the process")
-            break
-            
-        # Execute selected agent
+            self.save(END, finished=True)
+            self.done = True
+            return None
+
+        # Stop on a spent budget or a step that keeps coming back; the cards so far are kept
+        reason = self.governor.check(next_agent, self.state)
+        if reason is not None:
+            print(f"\nStopping early: {reason}")
+            self.done = True
+            return None
+        return build_agent_message(next_agent, self.state)
+
+    def end_step(self, next_agent: str, response) -> None:
+        apply_agent_response(next_agent, self.state, response)
+        # Update memory with new interaction
+        self.memory.put(ChatMessage(role="assistant", content=str(response)), speaker=next_agent)
+        print(f"\nUpdated memory with {next_agent}'s response")
+        self.step += 1
+        self.save(next_agent)
+
+    def report(self, final_cards: dict) -> None:
+        report_run(self.scheduler, self.memory, final_cards, self.governor, self.agents)
+
+
+def call_agent(run: CardRun, next_agent: str, message: str, shard_size: int, max_workers: int):
+    shards = card_shards(next_agent, run.state, shard_size)
+    if shards:
+        return run_card_shards(next_agent, run.state, shards, max_workers)
+    with borrow_agent(next_agent) as agent:
+        return agent.chat(message, chat_history=run.memory.get(next_agent))
+
+
+async def acall_agent(
+    run: CardRun,
+    next_agent: str,
+    message: str,
+    shard_size: int,
+    max_workers: int,
+    rate_limiter: Optional[TokenBucket] = None,
+):
+    shards = card_shards(next_agent, run.state, shard_size)
+    if shards:
+        return await arun_card_shards(next_agent, run.state, shards, max_workers, rate_limiter)
+    if rate_limiter is not None:
+        await rate_limiter.acquire()
+    with borrow_agent(next_agent) as agent:
+        return await agent.achat(message, chat_history=run.memory.get(next_agent))
+
+
+# Main Function
+def generate_anki_cards(
+    input_text: str,
+    max_iterations: int = 12,
+    max_chunk_tokens: int = 2000,
+    max_workers: int = 4,
+    shard_size: int = 5,
+    resume: bool = True,
+    doc_id: Optional[str] = None,
+) -> dict:
+    """
+    Runs the agent loop on input_text and returns the validated deck. doc_id
+    names the document in the near-duplicate index (default: its content key).
+    """
+    run = CardRun(input_text, max_iterations, resume, doc_id)
+    with run.active():
+        # Large inputs: analyze chunks in parallel, then continue with merged results
+        chunks = run.pending_chunks(max_chunk_tokens)
+        if chunks:
+            run.reduce(map_chunks(chunks, max_workers))
+
+        while not run.done:
+            # Decide next step locally, falling back to the Orchestrator
+            next_agent = run.scheduler.next_speaker(run.state, run.memory)
+            message = run.begin_step(next_agent)
+            if message is None:
+                continue
+            try:
+                with get_tracer().span(next_agent):
+                    response = call_agent(run, next_agent, message, shard_size, max_workers)
+                run.end_step(next_agent, response)
+            except Exception as e:
+                print(f"\nError in {next_agent}: {str(e)}")
+
+        # Final validation and transformation
         try:
-            if next_agent == Speaker.TOPIC_ANALYZER.value:
-                analyzer = topic_analyzer_factory()
-                response = analyzer.chat(
-                    f"Analyze this text for flashcard topics:\n\n{state['input_text']}",
-                    chat_history=current_history
-                )
-                state["topics"] = str(response)
-                print("\nTopic Analysis Results:")
-                print(state["topics"])
-                
-            elif next_agent == Speaker.QA_GENERATOR.value:
-                generator = qa_generator_factory()
-                response = generator.chat(
-                    f"Generate flashcards for this topic:\n\n{state['topics']}",
-                    chat_history=current_history
-                )
-                state["qa_cards"] = str(response)
-                print("\nGenerated Cards:")
-                print(state["qa_cards"])
-                
-            elif next_agent == Speaker.CODE_AND_EXTRA_FIELD_EXPERT.value:
-                expert = code_and_extra_field_expert_factory()
-                response = expert.chat(
-                    f"Enhance these flashcards with code examples and detailed explanations:\n\n{state['qa_cards']}",
-                    chat_history=current_history
-                )
-                state["qa_cards"] = str(response)
-                print("\nEnhanced Cards with Code Examples:")
-                print(state["qa_cards"])
-                
-            elif next_agent == Speaker.REVIEWER.value:
-                reviewer = reviewer_factory()
-                response = reviewer.chat(
-                    f"Review these flashcards:\n\n{state['qa_cards']}",
-                    chat_history=current_history
-                )
-                state["qa_cards"] = str(response)
-                state["review_status"] = "reviewed"
-                print("\nReviewed Cards:")
-                print(state["qa_cards"])
-                
-            elif next_agent == Speaker.FORMATTER.value:
-                formatter = formatter_agent_factory()
-                response = formatter.chat(
-                    f"Format these flashcards:\n\n{state['qa_cards']}",
-                    chat_history=current_history
-                )
-                state["qa_cards"] = str(response)
-                state["formatting_status"] = "completed"
-                print("\nFormatted Cards:")
-                print(state["qa_cards"])
-            
-            # Update memory with new interaction
-            memory.put(ChatMessage(role="assistant", content=str(response)))
-            print(f"\nUpdated memory with {next_agent}'s response")
-            
+            with get_tracer().span("Validation"):
+                final_cards = validate_and_transform(run.state["qa_cards"])
         except Exception as e:
-            print(f"\nError in {next_agent}: {str(e)}")
-            continue
-    
-    # Final validation and transformation
-    try:
-        final_cards = validate_and_transform(state["qa_cards"])
-        return final_cards
-    except Exception as e:
-        print(f"\nError in final transformation: {str(e)}")
-        return {}
+            print(f"\nError in final transformation: {str(e)}")
+            final_cards = {}
+        run.report(final_cards)
+    return final_cards
+
+
+# Async Main Function
+async def agenerate_anki_cards(
+    input_text: str,
+    max_iterations: int = 12,
+    max_chunk_tokens: int = 2000,
+    max_workers: int = 4,
+    shard_size: int = 5,
+    resume: bool = True,
+    rate_limiter: Optional[TokenBucket] = None,
+    doc_id: Optional[str] = None,
+) -> dict:
+    """Async counterpart of generate_anki_cards; every LLM call waits on rate_limiter if given."""
+    run = CardRun(input_text, max_iterations, resume, doc_id, rate_limiter)
+    with run.active():
+        chunks = run.pending_chunks(max_chunk_tokens)
+        if chunks:
+            run.reduce(await amap_chunks(chunks, max_workers, rate_limiter))
+
+        while not run.done:
+            next_agent = await run.scheduler.anext_speaker(run.state, run.memory)
+            message = run.begin_step(next_agent)
+            if message is None:
+                continue
+            try:
+                with get_tracer().span(next_agent):
+                    response = await acall_agent(run, next_agent, message, shard_size, max_workers, rate_limiter)
+                run.end_step(next_agent, response)
+            except Exception as e:
+                print(f"\nError in {next_agent}: {str(e)}")
+
+        try:
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
+            with get_tracer().span("Validation"):
+                final_cards = await avalidate_and_transform(run.state["qa_cards"])
+        except Exception as e:
+            print(f"\nError in final transformation: {str(e)}")
+            final_cards = {}
+        run.report(final_cards)
+    return final_cards
+
+
+# Incremental Regeneration
+def generate_section_cards(section: str, max_workers: int = 4, shard_size: int = 5) -> List[dict]:
+    """Runs topic analysis, Q&A generation and review on one section; returns card dicts."""
+    state = get_initial_state(section)
+    state["topics"], state["qa_cards"] = analyze_chunk(section)
+
+    reviewer = Speaker.REVIEWER.value
+    shards = card_shards(reviewer, state, shard_size)
+    with get_tracer().span(reviewer):
+        if shards:
+            response = run_card_shards(reviewer, state, shards, max_workers)
+        else:
+            with borrow_agent(reviewer) as agent:
+                response = agent.chat(build_agent_message(reviewer, state))
+    apply_agent_response(reviewer, state, response)
+    return validate_and_transform(state["qa_cards"])["cards"]
+
+
+def regenerate_anki_cards(
+    doc_id: str,
+    input_text: str,
+    max_chunk_tokens: int = 2000,
+    max_workers: int = 4,
+    shard_size: int = 5,
+) -> dict:
+    """
+    Rebuilds the deck for an edited document, calling the agents only for
+    sections that were added or modified since the last run of doc_id.
+    Cards of unchanged sections are reused and cards of deleted sections are
+    dropped. Needs SECTION_INDEX_PATH; without it the whole document is processed.
+    """
+    index = get_section_index()
+    if index is None:
+        print("\nSECTION_INDEX_PATH is not set, generating the whole document")
+        return generate_anki_cards(
+            input_text, max_chunk_tokens=max_chunk_tokens, max_workers=max_workers, shard_size=shard_size, doc_id=doc_id
+        )
+
+    sections = split_sections(input_text, max_tokens=max_chunk_tokens)
+    indexed = index.load(doc_id)
+    fingerprints, changed, deleted = diff_sections(sections, indexed)
+    print(f"\nSections: {len(set(fingerprints))} total, {len(changed)} new or modified, {deleted} deleted")
+
+    section_text = dict(zip(fingerprints, sections))
+
+    def safe_generate(fingerprint: str):
+        try:
+            return generate_section_cards(section_text[fingerprint], max_workers, shard_size)
+        except Exception as e:
+            # Left out of the index so the next run tries this section again
+            print(f"\nError generating section: {str(e)}")
+            return None
+
+    # Cards of the document's other (or earlier) sections are not duplicates from elsewhere
+    with run_scope(), AgentPool().active(), dedup_source(doc_id), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        generated = dict(zip(changed, pool.map(bind_context(safe_generate), changed)))
+
+    section_cards = {**indexed, **{fp: cards for fp, cards in generated.items() if cards is not None}}
+    ordered = [fp for fp in dict.fromkeys(fingerprints) if fp in section_cards]
+    index.replace(doc_id, [(fp, section_cards[fp]) for fp in ordered])
+    return Flashcard_model(cards=[card for fp in ordered for card in section_cards[fp]]).model_dump()
+
+
+# Streaming
+STREAMING_STAGES = (Speaker.QA_GENERATOR.value, Speaker.FORMATTER.value)
+
+
+def start_stream(input_text: str, final_stage: str) -> tuple:
+    """Returns (state, stages to run before final_stage) for a streamed run."""
+    if final_stage not in STREAMING_STAGES:
+        raise ValueError(f"final_stage must be one of {STREAMING_STAGES}")
+    state, _ = init_run(input_text)
+    stages = (Speaker.TOPIC_ANALYZER.value,) + STREAMING_STAGES[:STREAMING_STAGES.index(final_stage)]
+    return state, stages
+
+
+@contextmanager
+def stream_scope(input_text: str, doc_id: Optional[str]):
+    # Like CardRun.active(); the contexts stay set while the caller consumes the cards
+    governor = RunGovernor()
+    with run_scope(), governor.active(), AgentPool().active(), dedup_source(doc_id or document_key(input_text)):
+        yield governor
+
+
+def stream_stopped(governor: RunGovernor, stage: str, state: dict) -> bool:
+    reason = governor.check(stage, state)
+    if reason is not None:
+        print(f"\nStopping early: {reason}")
+    return reason is not None
+
+
+def finish_stream(governor: RunGovernor, deduper: StreamDeduper) -> None:
+    if deduper.dropped:
+        print(f"\nDropped {deduper.dropped} near-duplicate cards")
+    get_tracer().add_outputs(deduper.accepted)
+    print(f"\nRun budget: {governor.stats()}")
+
+
+def stream_anki_cards(
+    input_text: str,
+    final_stage: str = Speaker.QA_GENERATOR.value,
+    doc_id: Optional[str] = None,
+) -> Iterator[QACard]:
+    """
+    Yields validated QACards while the final stage's LLM is still generating.
+
+    Runs the Topic Analyzer, then streams the Q&A Generator. With
+    ``final_stage=Speaker.FORMATTER.value`` the generated cards are formatted
+    first and the Formatter's output is streamed instead. Near-duplicates are
+    dropped before a card is yielded, as in generate_anki_cards, and every
+    stage is traced and checked against the run budget. The final stage's span
+    includes the time the caller spends between cards.
+    """
+    state, stages = start_stream(input_text, final_stage)
+    with stream_scope(input_text, doc_id) as governor:
+        for stage in stages:
+            if stream_stopped(governor, stage, state):
+                return
+            with get_tracer().span(stage), borrow_agent(stage) as agent:
+                response = agent.chat(build_agent_message(stage, state))
+            apply_agent_response(stage, state, response)
+
+        if stream_stopped(governor, final_stage, state):
+            return
+        deduper = StreamDeduper(get_duplicate_index())
+        with get_tracer().span(final_stage), borrow_agent(final_stage) as agent:
+            response = agent.stream_chat(build_agent_message(final_stage, state))
+            try:
+                for card in iter_cards(response.response_gen):
+                    if deduper.accept(card):
+                        yield card
+            finally:
+                # Index the cards passed on, even if the caller stopped early
+                deduper.flush()
+            yield from deduper.leftovers()
+        finish_stream(governor, deduper)
+
+
+async def astream_anki_cards(
+    input_text: str,
+    final_stage: str = Speaker.QA_GENERATOR.value,
+    doc_id: Optional[str] = None,
+) -> AsyncIterator[QACard]:
+    """Async counterpart of stream_anki_cards, built on astream_chat."""
+    state, stages = start_stream(input_text, final_stage)
+    with stream_scope(input_text, doc_id) as governor:
+        for stage in stages:
+            if stream_stopped(governor, stage, state):
+                return
+            with get_tracer().span(stage), borrow_agent(stage) as agent:
+                response = await agent.achat(build_agent_message(stage, state))
+            apply_agent_response(stage, state, response)
+
+        if stream_stopped(governor, final_stage, state):
+            return
+        deduper = StreamDeduper(get_duplicate_index())
+        with get_tracer().span(final_stage), borrow_agent(final_stage) as agent:
+            response = await agent.astream_chat(build_agent_message(final_stage, state))
+            try:
+                async for card in aiter_cards(response.async_response_gen()):
+                    if deduper.accept(card):
+                        yield card
+            finally:
+                # Index the cards passed on, even if the caller stopped early
+                deduper.flush()
+            for card in deduper.leftovers():
+                yield card
+        finish_stream(governor, deduper)
+
+
+# Batch Driver
+async def generate_anki_cards_batch(texts, max_concurrency: int = 8, rpm_limit: Optional[float] = None):
+    """
+    Generates flashcards for many documents concurrently.
+
+    Yields a BatchResult for each document as soon as it finishes, in completion
+    order. A failure in one document is reported in its result and does not
+    affect the others. ``rpm_limit`` caps LLM requests per minute across the batch.
+    """
+    rate_limiter = TokenBucket.per_minute(rpm_limit) if rpm_limit else None
+
+    async def worker(text: str) -> dict:
+        return await agenerate_anki_cards(text, rate_limiter=rate_limiter)
+
+    async for result in run_batch(texts, worker, max_concurrency=max_concurrency):
+        yield result
 
 if __name__ == "__main__":
     # Example text with concepts and code that needs to be converted into flashcards.
@@ -1,6 +1,12 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
 from llama_index.agent.openai import OpenAIAgent
-from pprint import pformat
 from enum import Enum
+from card_parser import CARD_RE
+from chunking import TOPIC_RE
+from tracing import current_agent_pool
 from utils import get_shared_llm  
 
 
@@ -73,13 +79,10 @@ def reviewer_factory() -> OpenAIAgent:
     )
 
 # Topic Analyzer Implementation
-def topic_analyzer_factory(state: dict) -> OpenAIAgent:
-    system_prompt = f"""
+def topic_analyzer_factory() -> OpenAIAgent:
+    system_prompt = """
     You are the Topic Analyzer agent. Your task is to analyze the given text and identify key topics for flashcard creation.
     
-    Current State:
-    {pformat(state, indent=2)}
-    
     Instructions:
     1. Identify main concepts, sub-concepts, and their relationships
     2. Create a hierarchical structure of topics
@@ -157,12 +160,10 @@ def formatter_agent_factory() -> OpenAIAgent:
 
 
 # Orchestrator Implementation
-def orchestrator_factory(state: dict) -> OpenAIAgent:
-    system_prompt = f"""
+def orchestrator_factory() -> OpenAIAgent:
+    system_prompt = """
     You are the Orchestrator agent. Your task is to coordinate the interaction between all agents to create high-quality flashcards.
-
-    Current State:
-    {pformat(state, indent=2)}
+    The current state is given at the end of each request.
 
     Available agents:
     * Topic Analyzer - Breaks down complex topics into structured hierarchical concepts
@@ -197,3 +198,100 @@ def orchestrator_factory(state: dict) -> OpenAIAgent:
         llm=get_shared_llm(),
         system_prompt=system_prompt,
     )
+
+
+AGENT_FACTORIES: Dict[str, Callable[[], OpenAIAgent]] = {
+    Speaker.QA_GENERATOR.value: qa_generator_factory,
+    Speaker.REVIEWER.value: reviewer_factory,
+    Speaker.TOPIC_ANALYZER.value: topic_analyzer_factory,
+    Speaker.ORCHESTRATOR.value: orchestrator_factory,
+    Speaker.CODE_AND_EXTRA_FIELD_EXPERT.value: code_and_extra_field_expert_factory,
+    Speaker.FORMATTER.value: formatter_agent_factory,
+}
+
+
+# Agent Pool
+class AgentPool:
+    """
+    Agents built once per run and reused for every step.
+
+    The system prompts are static, so reused agents send a byte-identical
+    prompt prefix and provider-side prompt caching can hit. An agent keeps chat
+    memory, so each one is lent to a single caller at a time (concurrent chunks
+    and shards get their own) and is reset before it is handed out again.
+    """
+
+    def __init__(self):
+        self.built = 0
+        self.reused = 0
+        self._free: Dict[str, List[OpenAIAgent]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def active(self):
+        token = current_agent_pool.set(self)
+        try:
+            yield self
+        finally:
+            current_agent_pool.reset(token)
+
+    @contextmanager
+    def borrow(self, speaker: str):
+        with self._lock:
+            agent = self._free[speaker].pop() if self._free[speaker] else None
+            if agent is None:
+                self.built += 1
+            else:
+                self.reused += 1
+        if agent is None:
+            agent = AGENT_FACTORIES[speaker]()
+        else:
+            agent.reset()
+        try:
+            yield agent
+        finally:
+            with self._lock:
+                self._free[speaker].append(agent)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"built": self.built, "reused": self.reused}
+
+
+@contextmanager
+def borrow_agent(speaker: str):
+    """Lends an agent from the run's AgentPool, or builds a new one outside a run."""
+    pool = current_agent_pool.get()
+    if pool is None:
+        yield AGENT_FACTORIES[speaker]()
+        return
+    with pool.borrow(speaker) as agent:
+        yield agent
+
+
+# State Messages
+def state_summary(state: dict) -> Dict[str, str]:
+    """Compact view of the state: counts for the text fields, values for the flags."""
+    summary = {}
+    for key, value in state.items():
+        if key == "input_text":
+            continue
+        if key == "topics":
+            summary[key] = f"{len(TOPIC_RE.findall(value))} topics" if value else "none yet"
+        elif key == "qa_cards":
+            summary[key] = f"{len(CARD_RE.findall(value))} cards" if value else "none yet"
+        else:
+            summary[key] = str(value)
+    return summary
+
+
+def state_message(state: dict, previous: Optional[dict] = None) -> str:
+    """
+    The state as a short trailing block for a request, marking the fields that
+    changed since ``previous`` (the state sent with the last request).
+    """
+    lines = ["Current state:"]
+    for key, value in state_summary(state).items():
+        changed = previous is not None and previous.get(key) != state[key]
+        lines.append(f"- {key}: {value}" + (" (changed)" if changed else ""))
+    return "\n".join(lines)
@@ -0,0 +1,78 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, NamedTuple, Optional
+
+
+class BatchResult(NamedTuple):
+    index: int
+    cards: Optional[dict]
+    error: Optional[BaseException]
+
+
+# Rate Limiting
+class TokenBucket:
+    """
+    Async token bucket: ``rate`` tokens are added per second up to ``capacity``,
+    and each acquire() takes one token, waiting until one is available.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: Optional[float] = None) -> "TokenBucket":
+        return cls(rate=requests_per_minute / 60.0, capacity=burst or max(1.0, requests_per_minute / 60.0))
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        # The lock keeps waiters in FIFO order
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+# Batch Execution
+async def run_batch(
+    texts: Iterable[str],
+    worker: Callable[[str], Awaitable[Any]],
+    max_concurrency: int = 8,
+) -> AsyncIterator[BatchResult]:
+    """
+    Runs worker over texts with at most max_concurrency in flight, yielding a
+    BatchResult per text as each one finishes. Exceptions are captured per text.
+    """
+    texts = iter(enumerate(texts))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def consume() -> None:
+        for index, text in texts:
+            try:
+                results.put_nowait(BatchResult(index, await worker(text), None))
+            except Exception as e:
+                results.put_nowait(BatchResult(index, None, e))
+        results.put_nowait(None)
+
+    workers = [asyncio.create_task(consume()) for _ in range(max_concurrency)]
+    try:
+        remaining = len(workers)
+        while remaining:
+            result = await results.get()
+            if result is None:
+                remaining -= 1
+            else:
+                yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
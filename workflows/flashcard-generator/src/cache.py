@@ -0,0 +1,250 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse
+from pydantic import PrivateAttr
+from tracing import TracedOpenAI
+
+
+# Cache Keys
+def make_cache_key(model: str, temperature: float, messages: Sequence[ChatMessage], **kwargs: Any) -> str:
+    """Hashes everything that determines an LLM response into a stable key."""
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "messages": [
+            {
+                "role": str(getattr(m.role, "value", m.role)),
+                "content": m.content,
+                "additional_kwargs": m.additional_kwargs,
+            }
+            for m in messages
+        ],
+        "kwargs": kwargs,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=_to_jsonable)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _to_jsonable(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+# Response Serialization
+def dump_chat_response(response: ChatResponse) -> str:
+    message = response.message
+    additional_kwargs = dict(message.additional_kwargs)
+    if "tool_calls" in additional_kwargs:
+        additional_kwargs["tool_calls"] = [
+            _to_jsonable(call) if not isinstance(call, dict) else call
+            for call in additional_kwargs["tool_calls"]
+        ]
+    return json.dumps(
+        {
+            "role": str(getattr(message.role, "value", message.role)),
+            "content": message.content,
+            "additional_kwargs": additional_kwargs,
+        },
+        default=_to_jsonable,
+    )
+
+
+def load_chat_response(value: str) -> ChatResponse:
+    data = json.loads(value)
+    additional_kwargs = data.get("additional_kwargs", {})
+    if "tool_calls" in additional_kwargs:
+        # Agents expect the OpenAI SDK objects, not plain dicts
+        from openai.types.chat import ChatCompletionMessageToolCall
+
+        additional_kwargs["tool_calls"] = [
+            ChatCompletionMessageToolCall.model_validate(call)
+            for call in additional_kwargs["tool_calls"]
+        ]
+    message = ChatMessage(
+        role=data["role"],
+        content=data["content"],
+        additional_kwargs=additional_kwargs,
+    )
+    return ChatResponse(message=message)
+
+
+# Two-tier Response Cache
+class ResponseCache:
+    """
+    Content-addressed store for LLM responses.
+
+    An in-memory LRU tier sits in front of a SQLite file. Entries older than
+    ``max_age_seconds`` are treated as misses, and the on-disk table is pruned
+    down to ``max_entries`` rows (least recently used first).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10000,
+        max_memory_entries: int = 256,
+        max_age_seconds: Optional[float] = None,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_memory_entries = max_memory_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+        self._conn.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.max_age_seconds is not None and now - created_at > self.max_age_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return entry[0]
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+            self._remember(key, value, now)
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        if self.max_age_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.max_age_seconds,)
+            )
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Cached LLM
+class CachedOpenAI(TracedOpenAI):
+    """
+    OpenAI LLM that serves repeated chat calls from a ResponseCache.
+
+    Calls with ``temperature > 0`` are not cached unless ``cache_nondeterministic``
+    is set, since a fresh sample is what the caller asked for.
+    """
+
+    cache_nondeterministic: bool = False
+    _response_cache: Optional[ResponseCache] = PrivateAttr(default=None)
+
+    def __init__(self, response_cache: ResponseCache, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._response_cache = response_cache
+
+    @property
+    def response_cache(self) -> ResponseCache:
+        return self._response_cache
+
+    def _cache_key(self, messages: Sequence[ChatMessage], **kwargs: Any) -> Optional[str]:
+        if self.temperature > 0 and not self.cache_nondeterministic:
+            self._response_cache.record_bypass()
+            return None
+        return make_cache_key(self.model, self.temperature, messages, **kwargs)
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        key = self._cache_key(messages, **kwargs)
+        if key is not None:
+            cached = self._response_cache.get(key)
+            if cached is not None:
+                self.record_cache_hit()
+                return load_chat_response(cached)
+        response = super().chat(messages, **kwargs)
+        if key is not None:
+            self._response_cache.set(key, dump_chat_response(response))
+        return response
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        key = self._cache_key(messages, **kwargs)
+        if key is not None:
+            cached = self._response_cache.get(key)
+            if cached is not None:
+                self.record_cache_hit()
+                return load_chat_response(cached)
+        response = await super().achat(messages, **kwargs)
+        if key is not None:
+            self._response_cache.set(key, dump_chat_response(response))
+        return response
@@ -0,0 +1,138 @@
+import html
+import re
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+
+from models import QACard
+
+CARD_OPEN_RE = re.compile(r"<card(?:\s[^>]*)?>", re.IGNORECASE)
+CARD_CLOSE_RE = re.compile(r"</card\s*>", re.IGNORECASE)
+# A whole <card> element; every module that finds cards in text uses this one
+CARD_RE = re.compile(CARD_OPEN_RE.pattern + r".*?" + CARD_CLOSE_RE.pattern, re.DOTALL | re.IGNORECASE)
+CDATA_RE = re.compile(r"<!\[CDATA\[(.*?)\]\]>", re.DOTALL)
+
+
+# Field Extraction
+def _clean(text: str) -> str:
+    text = CDATA_RE.sub(lambda m: m.group(1), text)
+    return html.unescape(text.strip())
+
+
+def _field(body: str, name: str, allow_truncated: bool = False) -> Optional[str]:
+    """
+    Returns the text between <name> and </name>. The content is taken verbatim,
+    so unescaped '<' or '&' inside code does not break parsing.
+    """
+    match = re.search(rf"<{name}(?:\s[^>]*)?>", body, re.IGNORECASE)
+    if match is None:
+        return None
+    end = re.search(rf"</{name}\s*>", body[match.end():], re.IGNORECASE)
+    if end is None:
+        return _clean(body[match.end():]) if allow_truncated else None
+    return _clean(body[match.end():match.end() + end.start()])
+
+
+def parse_card(body: str, truncated: bool = False) -> Optional[QACard]:
+    """Builds a QACard from the inside of a <card> element, or None if it cannot be recovered."""
+    question = _field(body, "question")
+    answer = _field(body, "answer", allow_truncated=truncated)
+    if not question or not answer:
+        return None
+    extra = _field(body, "extra", allow_truncated=truncated) or ""
+    return QACard(question=question, answer=answer, extra=extra)
+
+
+# Incremental Parser
+class CardParser:
+    """
+    Incremental, tolerant parser for <card> elements.
+
+    Feed text as it arrives with feed(); completed cards are returned as soon as
+    their closing tag is seen. Call close() at the end to recover a truncated
+    trailing card. Fragments that could not be turned into a QACard are kept in
+    ``unparsed`` so a caller can hand just those to the LLM.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        # Offset of the current card's body in the buffer, or None between cards
+        self._body_start: Optional[int] = None
+        self._scan_from = 0
+        self.unparsed: List[str] = []
+
+    def feed(self, text: str) -> List[QACard]:
+        self._buffer += text
+        buffer = self._buffer
+        cards = []
+        consumed = 0
+        while True:
+            if self._body_start is None:
+                start = CARD_OPEN_RE.search(buffer, consumed)
+                if start is None:
+                    # Keep a short tail in case an opening tag is split across chunks
+                    consumed = max(consumed, len(buffer) - 16)
+                    break
+                self._body_start = self._scan_from = start.end()
+
+            close = CARD_CLOSE_RE.search(buffer, self._scan_from)
+            reopen = CARD_OPEN_RE.search(buffer, self._scan_from)
+            if reopen is not None and (close is None or reopen.start() < close.start()):
+                # A new card started before this one was closed
+                self._emit(buffer[self._body_start:reopen.start()], cards, truncated=True)
+                consumed = reopen.start()
+                self._body_start = None
+                continue
+            if close is None:
+                consumed = self._body_start
+                self._scan_from = max(self._body_start, len(buffer) - 16)
+                break
+
+            self._emit(buffer[self._body_start:close.start()], cards)
+            consumed = close.end()
+            self._body_start = None
+
+        # Drop everything before the first byte still needed
+        self._buffer = buffer[consumed:]
+        if self._body_start is not None:
+            self._body_start -= consumed
+            self._scan_from -= consumed
+        return cards
+
+    def close(self) -> List[QACard]:
+        cards = []
+        if self._body_start is not None:
+            self._emit(self._buffer[self._body_start:], cards, truncated=True)
+        self._buffer = ""
+        self._body_start = None
+        self._scan_from = 0
+        return cards
+
+    def _emit(self, body: str, cards: List[QACard], truncated: bool = False) -> None:
+        card = parse_card(body, truncated=truncated)
+        if card is not None:
+            cards.append(card)
+        elif body.strip():
+            self.unparsed.append(f"<card>{body}</card>")
+
+
+def iter_cards(chunks: Iterable[str], parser: Optional[CardParser] = None) -> Iterator[QACard]:
+    """Yields QACards from an iterable of text chunks as they complete."""
+    parser = parser or CardParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+async def aiter_cards(chunks: AsyncIterable[str], parser: Optional[CardParser] = None) -> AsyncIterator[QACard]:
+    parser = parser or CardParser()
+    async for chunk in chunks:
+        for card in parser.feed(chunk):
+            yield card
+    for card in parser.close():
+        yield card
+
+
+def parse_cards(text: str) -> Tuple[List[QACard], List[str]]:
+    """Parses a complete response; returns (cards, fragments that could not be parsed)."""
+    parser = CardParser()
+    cards = parser.feed(text) + parser.close()
+    return cards, parser.unparsed
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+# Fingerprints
+def document_key(input_text: str) -> str:
+    """Key under which a document's run is checkpointed."""
+    return hashlib.sha256(input_text.encode("utf-8")).hexdigest()
+
+
+# Checkpoint Store
+class CheckpointStore:
+    """
+    SQLite store holding the latest checkpoint of each document's run: the
+    pipeline state, memory contents, scheduler counters and the step reached.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " doc_key TEXT PRIMARY KEY,"
+            " step INTEGER NOT NULL,"
+            " last_agent TEXT,"
+            " finished INTEGER NOT NULL DEFAULT 0,"
+            " payload TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def save(
+        self,
+        doc_key: str,
+        step: int,
+        last_agent: Optional[str],
+        state: dict,
+        memory: list,
+        scheduler: dict,
+        finished: bool = False,
+    ) -> None:
+        payload = json.dumps({"state": state, "memory": memory, "scheduler": scheduler})
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints"
+                " (doc_key, step, last_agent, finished, payload, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_key, step, last_agent, int(finished), payload, time.time()),
+            )
+            self._conn.commit()
+
+    def load(self, doc_key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT step, last_agent, finished, payload FROM checkpoints WHERE doc_key = ?",
+                (doc_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        checkpoint = json.loads(row[3])
+        checkpoint.update(step=row[0], last_agent=row[1], finished=bool(row[2]))
+        return checkpoint
+
+    def delete(self, doc_key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE doc_key = ?", (doc_key,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
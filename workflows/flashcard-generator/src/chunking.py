@@ -0,0 +1,164 @@
+import re
+from typing import Callable, List, Optional
+
+from card_parser import CARD_RE
+
+HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s")
+FENCE_RE = re.compile(r"^\s*(```|~~~)")
+TOPIC_RE = re.compile(r"<topic>.*?</topic>", re.DOTALL)
+TOPIC_NAME_RE = re.compile(r"<name>(.*?)</name>", re.DOTALL)
+QUESTION_RE = re.compile(r"<question(?:\s[^>]*)?>(.*?)</question\s*>", re.DOTALL | re.IGNORECASE)
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+# Token Counting
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), used when no tokenizer is given."""
+    return max(1, len(text) // 4)
+
+
+def get_token_counter() -> Callable[[str], int]:
+    """Returns a token counter backed by the llama_index tokenizer, or estimate_tokens."""
+    try:
+        from llama_index.core.utils import get_tokenizer
+
+        tokenizer = get_tokenizer()
+        return lambda text: len(tokenizer(text))
+    except Exception:
+        return estimate_tokens
+
+
+# Splitting
+def split_blocks(text: str) -> List[str]:
+    """
+    Splits text into blocks that should not be cut: each code fence is one
+    block, and prose is split at headings and blank lines.
+    """
+    blocks, current = [], []
+    in_fence = False
+
+    def flush():
+        if any(line.strip() for line in current):
+            blocks.append("\n".join(current).strip("\n"))
+        current.clear()
+
+    for line in text.splitlines():
+        if FENCE_RE.match(line):
+            if not in_fence:
+                flush()
+                current.append(line)
+                in_fence = True
+            else:
+                current.append(line)
+                flush()
+                in_fence = False
+            continue
+        if in_fence:
+            current.append(line)
+        elif HEADING_RE.match(line) or not line.strip():
+            flush()
+            current.append(line)
+        else:
+            current.append(line)
+    flush()
+    return blocks
+
+
+def _split_units(block: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[tuple]:
+    """
+    Returns (separator, text) pairs: the block's lines, with a line that is
+    larger than max_tokens split into sentences, and a sentence that is still
+    too large split into words.
+    """
+    units = []
+    for line in block.splitlines():
+        parts = [line]
+        if count_tokens(line) > max_tokens:
+            parts = [part for part in SENTENCE_RE.split(line.strip()) if part]
+            parts = [word for part in parts for word in (part.split() if count_tokens(part) > max_tokens else [part])]
+        units.append(("\n", parts[0] if parts else ""))
+        units += [(" ", part) for part in parts[1:]]
+    return units
+
+
+def _split_oversized(block: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """
+    Splits a block larger than max_tokens at line breaks, falling back to
+    sentence and word boundaries. A leading heading stays with the first piece.
+    """
+    pieces, current = [], ""
+    for separator, text in _split_units(block, max_tokens, count_tokens):
+        candidate = current + separator + text if current else text
+        if current and count_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            candidate = text
+        current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(
+    text: str,
+    max_tokens: int = 2000,
+    count_tokens: Optional[Callable[[str], int]] = None,
+) -> List[str]:
+    """
+    Splits text into chunks of at most max_tokens, starting a new chunk at a
+    heading where possible and never splitting a code fence unless the fence
+    alone is larger than max_tokens.
+    """
+    count_tokens = count_tokens or get_token_counter()
+    chunks, current, current_tokens = [], [], 0
+
+    for block in split_blocks(text):
+        block_tokens = count_tokens(block)
+        starts_section = HEADING_RE.match(block) is not None
+        if current and (current_tokens + block_tokens > max_tokens or starts_section and current_tokens > max_tokens // 2):
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+
+        if block_tokens > max_tokens:
+            chunks.extend(_split_oversized(block, max_tokens, count_tokens))
+            continue
+        current.append(block)
+        current_tokens += block_tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+# Reduce Step
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def merge_topics(outputs: List[str]) -> str:
+    """Merges Topic Analyzer outputs into one <topics> tree, dropping repeated topic names."""
+    topics, seen = [], set()
+    for output in outputs:
+        for topic in TOPIC_RE.findall(output):
+            name = TOPIC_NAME_RE.search(topic)
+            key = _normalize(name.group(1) if name else topic)
+            if key not in seen:
+                seen.add(key)
+                topics.append(topic)
+    if not topics:
+        return "\n\n".join(output.strip() for output in outputs if output.strip())
+    return "<topics>\n" + "\n".join(topics) + "\n</topics>"
+
+
+def merge_cards(outputs: List[str]) -> str:
+    """Concatenates <card> elements from several outputs, dropping repeated questions."""
+    cards, seen = [], set()
+    for output in outputs:
+        for card in CARD_RE.findall(output):
+            question = QUESTION_RE.search(card)
+            key = _normalize(question.group(1) if question else card)
+            if key not in seen:
+                seen.add(key)
+                cards.append(card)
+    if not cards:
+        return "\n\n".join(output.strip() for output in outputs if output.strip())
+    return "\n".join(cards)
@@ -0,0 +1,268 @@
+import hashlib
+import sqlite3
+import struct
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models import QACard
+from card_parser import CARD_RE, parse_card
+
+NUM_BINS = 32
+BANDS = 8
+ROWS = NUM_BINS // BANDS
+_MAX_HASH = (1 << 64) - 1
+_SIGNATURE = struct.Struct(f">{NUM_BINS}Q")
+
+# Document (or other source) whose cards are being indexed; see dedup_source()
+current_source: ContextVar[str] = ContextVar("current_source", default="")
+
+
+@contextmanager
+def dedup_source(source: str):
+    """Indexes cards deduplicated in this block under source, e.g. the document id."""
+    token = current_source.set(source)
+    try:
+        yield source
+    finally:
+        current_source.reset(token)
+
+
+# MinHash Signatures
+def shingles(text: str, k: int = 2) -> set:
+    """Word k-grams of the normalized text (the whole text if it is shorter than k words)."""
+    words = "".join(c if c.isalnum() else " " for c in text.lower()).split()
+    if len(words) <= k:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def _stable_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def signature(text: str) -> Tuple[int, ...]:
+    """
+    One-permutation MinHash: each shingle is hashed once and the minimum is
+    kept per bin, with empty bins filled from the next non-empty one. This
+    costs one hash per shingle instead of one per shingle and permutation.
+    """
+    bins = [_MAX_HASH] * NUM_BINS
+    for shingle in shingles(text):
+        h = _stable_hash(shingle)
+        b = h % NUM_BINS
+        if h < bins[b]:
+            bins[b] = h
+    if all(v == _MAX_HASH for v in bins):
+        return tuple(bins)
+    for i in range(NUM_BINS):
+        offset = 0
+        while bins[(i + offset) % NUM_BINS] == _MAX_HASH:
+            offset += 1
+        if offset:
+            bins[i] = (bins[(i + offset) % NUM_BINS] + offset) & _MAX_HASH
+    return tuple(bins)
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_BINS
+
+
+def card_text(card: QACard) -> str:
+    return f"{card.question} {card.answer}"
+
+
+# Duplicate Index
+class DuplicateIndex:
+    """
+    MinHash/LSH index of flashcard text for near-duplicate lookups.
+
+    Signatures are split into BANDS bands held in in-memory hash tables, so a
+    lookup only compares against cards that share a band. With ``path`` the
+    signatures are also stored in SQLite and reloaded on open, so the index
+    persists across runs. Every card is stored with the source (document id)
+    it came from, and lookups can ignore a source's own cards, so running or
+    regenerating a document never matches its earlier cards.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.7):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._signatures: List[Tuple[int, ...]] = []
+        self._sources: List[str] = []
+        self._bands: List[Dict[Tuple[int, ...], List[int]]] = [defaultdict(list) for _ in range(BANDS)]
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cards ("
+                " id INTEGER PRIMARY KEY,"
+                " signature BLOB NOT NULL,"
+                " question TEXT,"
+                " source TEXT NOT NULL DEFAULT '')"
+            )
+            # Indexes written before sources were stored
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cards)")}
+            if "source" not in columns:
+                self._conn.execute("ALTER TABLE cards ADD COLUMN source TEXT NOT NULL DEFAULT ''")
+            self._conn.commit()
+            for blob, source in self._conn.execute("SELECT signature, source FROM cards ORDER BY id"):
+                self._insert(_SIGNATURE.unpack(blob), source)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _insert(self, sig: Tuple[int, ...], source: str = "") -> int:
+        card_id = len(self._signatures)
+        self._signatures.append(sig)
+        self._sources.append(source)
+        for band in range(BANDS):
+            self._bands[band][sig[band * ROWS:(band + 1) * ROWS]].append(card_id)
+        return card_id
+
+    def _find(self, sig: Tuple[int, ...], exclude_source: str = "") -> Optional[int]:
+        seen = set()
+        for band in range(BANDS):
+            for card_id in self._bands[band].get(sig[band * ROWS:(band + 1) * ROWS], ()):
+                if card_id in seen:
+                    continue
+                seen.add(card_id)
+                if exclude_source and self._sources[card_id] == exclude_source:
+                    continue
+                if similarity(sig, self._signatures[card_id]) >= self.threshold:
+                    return card_id
+        return None
+
+    def find(self, text: str, exclude_source: str = "") -> Optional[int]:
+        """Returns the id of an indexed near-duplicate of text (not from exclude_source), or None."""
+        sig = signature(text)
+        with self._lock:
+            return self._find(sig, exclude_source)
+
+    def add_if_new(self, text: str, label: str = "", source: str = "") -> bool:
+        """
+        Indexes text under source unless it is a near-duplicate of a card from
+        another source (any card, if source is empty); returns True if it was new.
+        """
+        return self.add_many([(text, label)], source)[0]
+
+    def add_many(self, items: Sequence[Tuple[str, str]], source: str = "") -> List[bool]:
+        """
+        add_if_new for a batch of (text, label) pairs, e.g. one deck; the new
+        ones are stored with one executemany and one commit. Returns whether
+        each pair was new.
+        """
+        sigs = [signature(text) for text, _ in items]
+        added, rows = [], []
+        with self._lock:
+            for (_, label), sig in zip(items, sigs):
+                new = self._find(sig, source) is None
+                if new:
+                    self._insert(sig, source)
+                    rows.append((_SIGNATURE.pack(*sig), label, source))
+                added.append(new)
+            if self._conn is not None and rows:
+                self._conn.executemany("INSERT INTO cards (signature, question, source) VALUES (?, ?, ?)", rows)
+                self._conn.commit()
+        return added
+
+    def close(self) -> None:
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+
+
+# Deck Deduplication
+def dedupe_deck(qa_cards: str, index: Optional[DuplicateIndex] = None, source: Optional[str] = None) -> str:
+    """
+    Drops <card> elements that are near-duplicates of earlier cards in the deck
+    or of cards another source put in index, and indexes the rest under source
+    (by default the one set with dedup_source()). Text without recognizable
+    cards is returned unchanged. A deck whose cards are all indexed from other
+    sources keeps them, so a non-empty deck never comes back empty.
+    """
+    raw_cards = CARD_RE.findall(qa_cards)
+    if not raw_cards:
+        return qa_cards
+    source = current_source.get() if source is None else source
+    deck = DuplicateIndex()
+    # Cards left after deduplicating within the deck, and the parsed ones to check against index
+    unique, parsed, batch = [], [], []
+    for raw in raw_cards:
+        card = parse_card(raw[raw.index(">") + 1:raw.rindex("<")])
+        if card is None:
+            unique.append(raw)
+            continue
+        text = card_text(card)
+        if not deck.add_if_new(text):
+            continue
+        parsed.append(len(unique))
+        unique.append(raw)
+        batch.append((text, card.question))
+    new = [True] * len(unique)
+    if index is not None and batch:
+        for position, added in zip(parsed, index.add_many(batch, source)):
+            new[position] = added
+    kept = [raw for raw, added in zip(unique, new) if added]
+    if not kept:
+        # An empty deck would only send the loop back to the Q&A Generator
+        print(f"\nAll {len(unique)} cards are already indexed from other documents, keeping them")
+        kept = unique
+    if len(kept) < len(raw_cards):
+        print(f"\nDropped {len(raw_cards) - len(kept)} near-duplicate cards")
+    return "\n".join(kept)
+
+
+class StreamDeduper:
+    """
+    dedupe_deck for cards that arrive one at a time: accept() says whether to
+    pass a card on, and leftovers() returns the cards held back because they
+    were indexed from other sources if no card was accepted, so a stream is
+    never emptied by the index. Accepted cards are added to the index in one
+    batch by flush(), at the end of the stream; lookups skip the stream's own
+    source, so they don't need its earlier cards.
+    """
+
+    def __init__(self, index: Optional[DuplicateIndex] = None, source: Optional[str] = None):
+        self.index = index
+        self.source = current_source.get() if source is None else source
+        self.deck = DuplicateIndex()
+        self.accepted = 0
+        self.dropped = 0
+        self._held: List[QACard] = []
+        self._pending: List[Tuple[str, str]] = []
+
+    def accept(self, card: QACard) -> bool:
+        text = card_text(card)
+        if not self.deck.add_if_new(text):
+            self.dropped += 1
+            return False
+        if self.index is None or self.index.find(text, exclude_source=self.source) is None:
+            self._pending.append((text, card.question))
+            self.accepted += 1
+            return True
+        self._held.append(card)
+        return False
+
+    def flush(self) -> None:
+        if self.index is not None and self._pending:
+            self.index.add_many(self._pending, self.source)
+        self._pending = []
+
+    def leftovers(self) -> List[QACard]:
+        if self.accepted or not self._held:
+            self.dropped += len(self._held)
+            return []
+        print(f"\nAll {len(self._held)} cards are already indexed from other documents, keeping them")
+        held, self._held = self._held, []
+        self.accepted += len(held)
+        return held
+
+
+def dedupe_cards(cards: List[QACard], threshold: float = 0.7) -> List[QACard]:
+    """Removes near-duplicates within a list of cards, keeping the first of each group."""
+    index = DuplicateIndex(threshold=threshold)
+    return [card for card in cards if index.add_if_new(card_text(card))]
@@ -0,0 +1,244 @@
+import csv
+import hashlib
+import html
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import zipfile
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+from models import QACard
+
+_BASE91 = (
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    "!#$%&()*+,-./:;<=>?@[]^_`{|}~"
+)
+FIELD_SEPARATOR = "\x1f"
+FIELD_NAMES = ["Question", "Answer", "Extra"]
+
+
+# Stable Identifiers
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.sha256(value.encode("utf-8")).digest()[:8], "big")
+
+
+def note_guid(card: QACard) -> str:
+    """
+    GUID derived from the normalized question and answer, so exporting the same
+    card again updates the existing Anki note instead of adding a second one,
+    and cards that share a question but not an answer stay separate notes.
+    """
+    value = _hash64("\x1f".join(" ".join(text.lower().split()) for text in (card.question, card.answer)))
+    chars = []
+    while value:
+        value, rem = divmod(value, len(_BASE91))
+        chars.append(_BASE91[rem])
+    return "".join(reversed(chars)) or _BASE91[0]
+
+
+def stable_id(name: str) -> int:
+    """Model/deck id in Anki's usual range, derived from name so it is the same on every export."""
+    return (1 << 30) + _hash64(name) % (1 << 30)
+
+
+def to_html(text: str) -> str:
+    return html.escape(text).replace("\n", "<br>")
+
+
+def _batches(rows: Iterator[tuple], size: int) -> Iterator[List[tuple]]:
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+# Anki Collection Schema (legacy .anki2, schema 11)
+_SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null, scm integer not null,
+    ver integer not null, dty integer not null, usn integer not null, ls integer not null,
+    conf text not null, models text not null, decks text not null, dconf text not null, tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null, mod integer not null,
+    usn integer not null, tags text not null, flds text not null, sfld integer not null,
+    csum integer not null, flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null, ord integer not null,
+    mod integer not null, usn integer not null, type integer not null, queue integer not null,
+    due integer not null, ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null, odid integer not null,
+    flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null, ease integer not null,
+    ivl integer not null, lastIvl integer not null, factor integer not null, time integer not null,
+    type integer not null
+);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn ON notes (usn);
+CREATE INDEX ix_cards_usn ON cards (usn);
+CREATE INDEX ix_revlog_usn ON revlog (usn);
+CREATE INDEX ix_cards_nid ON cards (nid);
+CREATE INDEX ix_cards_sched ON cards (did, queue, due);
+CREATE INDEX ix_revlog_cid ON revlog (cid);
+CREATE INDEX ix_notes_csum ON notes (csum);
+"""
+
+_CSS = ".card { font-family: arial; font-size: 20px; text-align: left; color: black; background-color: white; }"
+
+_DECK_CONF = {
+    "id": 1, "name": "Default", "mod": 0, "usn": 0, "maxTaken": 60, "autoplay": True, "timer": 0,
+    "replayq": True, "dyn": False,
+    "new": {"bury": True, "delays": [1, 10], "initialFactor": 2500, "ints": [1, 4, 7], "order": 1, "perDay": 20, "separate": True},
+    "lapse": {"delays": [10], "leechAction": 0, "leechFails": 8, "minInt": 1, "mult": 0},
+    "rev": {"bury": True, "ease4": 1.3, "fuzz": 0.05, "ivlFct": 1, "maxIvl": 36500, "minSpace": 1, "perDay": 100},
+}
+
+
+def _model(model_id: int, deck_id: int, now: int) -> dict:
+    return {
+        "id": model_id,
+        "name": "Flashcard Generator (Q&A)",
+        "type": 0,
+        "mod": now,
+        "usn": -1,
+        "sortf": 0,
+        "did": deck_id,
+        "tags": [],
+        "vers": [],
+        "css": _CSS,
+        "latexPre": "\\documentclass[12pt]{article}\n\\special{papersize=3in,5in}\n\\usepackage{amssymb,amsmath}\n"
+                    "\\pagestyle{empty}\n\\setlength{\\parindent}{0in}\n\\begin{document}\n",
+        "latexPost": "\\end{document}",
+        "req": [[0, "any", [0]]],
+        "flds": [
+            {"name": name, "ord": i, "font": "Arial", "size": 20, "media": [], "rtl": False, "sticky": False}
+            for i, name in enumerate(FIELD_NAMES)
+        ],
+        "tmpls": [{
+            "name": "Card 1",
+            "ord": 0,
+            "qfmt": "{{Question}}",
+            "afmt": "{{FrontSide}}<hr id=answer>{{Answer}}{{#Extra}}<br><br>{{Extra}}{{/Extra}}",
+            "bqfmt": "",
+            "bafmt": "",
+            "did": None,
+        }],
+    }
+
+
+def _deck(deck_id: int, name: str, now: int) -> dict:
+    return {
+        "id": deck_id, "name": name, "desc": "", "mod": now, "usn": -1, "conf": 1, "dyn": 0,
+        "collapsed": False, "extendNew": 10, "extendRev": 50,
+        "newToday": [0, 0], "revToday": [0, 0], "lrnToday": [0, 0], "timeToday": [0, 0],
+    }
+
+
+# Anki Package Export
+def export_apkg(
+    cards: Iterable[QACard],
+    path: str,
+    deck_name: str = "Flashcard Generator",
+    media_files: Optional[List[str]] = None,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Streams cards into an Anki package (a collection.anki2 SQLite file plus a
+    media map, zipped) and returns the number of notes written.
+
+    Cards are inserted in batches of ``batch_size`` inside one transaction, so
+    memory stays flat however long the iterator is. Note GUIDs come from
+    note_guid(), and model and deck ids from their names, so importing a
+    re-export updates the existing notes.
+    """
+    now = int(time.time())
+    model_id = stable_id("flashcard-generator-qa-model")
+    deck_id = stable_id(deck_name)
+    # Note and card ids only need to be unique inside the package
+    base_id = int(time.time() * 1000)
+
+    def rows() -> Iterator[tuple]:
+        for position, card in enumerate(cards):
+            fields = [to_html(card.question), to_html(card.answer), to_html(card.extra)]
+            csum = int(hashlib.sha1(card.question.strip().encode("utf-8")).hexdigest()[:8], 16)
+            yield position, note_guid(card), FIELD_SEPARATOR.join(fields), fields[0], csum
+
+    fd, db_path = tempfile.mkstemp(suffix=".anki2")
+    os.close(fd)
+    count = 0
+    try:
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            # Scratch file that is zipped afterwards, so no journal or fsync is needed
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.executescript(_SCHEMA)
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT INTO col VALUES (1, ?, ?, ?, 11, 0, 0, 0, ?, ?, ?, ?, '{}')",
+                (
+                    now, now * 1000, now * 1000,
+                    json.dumps({"activeDecks": [1], "curDeck": 1, "nextPos": 1, "sortType": "noteFld"}),
+                    json.dumps({str(model_id): _model(model_id, deck_id, now)}),
+                    json.dumps({"1": _deck(1, "Default", now), str(deck_id): _deck(deck_id, deck_name, now)}),
+                    json.dumps({"1": _DECK_CONF}),
+                ),
+            )
+            for batch in _batches(rows(), batch_size):
+                conn.executemany(
+                    "INSERT INTO notes VALUES (?, ?, ?, ?, -1, '', ?, ?, ?, 0, '')",
+                    [(base_id + pos, guid, model_id, now, flds, sfld, csum) for pos, guid, flds, sfld, csum in batch],
+                )
+                conn.executemany(
+                    "INSERT INTO cards VALUES (?, ?, ?, 0, ?, -1, 0, 0, ?, 0, 0, 0, 0, 0, 0, 0, 0, '')",
+                    [(base_id + pos, base_id + pos, deck_id, now, pos) for pos, *_ in batch],
+                )
+                count += len(batch)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        media_files = media_files or []
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+            package.write(db_path, "collection.anki2")
+            package.writestr("media", json.dumps({str(i): os.path.basename(f) for i, f in enumerate(media_files)}))
+            for i, media_path in enumerate(media_files):
+                package.write(media_path, str(i))
+    finally:
+        os.remove(db_path)
+    return count
+
+
+# CSV / TSV Export
+def export_csv(
+    cards: Iterable[QACard],
+    path: str,
+    delimiter: str = ",",
+    anki_headers: bool = True,
+) -> int:
+    """
+    Streams cards to a CSV (or TSV with ``delimiter="\\t"``) file with a GUID
+    column and returns the number of rows written. With ``anki_headers`` the
+    file starts with Anki's import directives, so Anki maps the columns and
+    uses the GUID to update notes from earlier imports.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if anki_headers:
+            separator = {",": "Comma", "\t": "Tab", ";": "Semicolon"}.get(delimiter, delimiter)
+            columns = delimiter.join(FIELD_NAMES + ["GUID"])
+            f.write(f"#separator:{separator}\n#html:false\n#columns:{columns}\n#guid column:4\n")
+        writer = csv.writer(f, delimiter=delimiter)
+        if not anki_headers:
+            writer.writerow([name.lower() for name in FIELD_NAMES] + ["guid"])
+        for card in cards:
+            writer.writerow([card.question, card.answer, card.extra, note_guid(card)])
+            count += 1
+    return count
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse
+from pydantic import PrivateAttr
+from card_parser import CARD_RE
+from chunking import estimate_tokens
+from tracing import TracedOpenAI, current_agent
+
+DEFAULT_TOPICS = """<topics>
+    <topic>
+        <name>Sample topic</name>
+        <subtopics>
+            <subtopic>Sample subtopic</subtopic>
+        </subtopics>
+        <applications>Sample application</applications>
+        <prerequisites>None</prerequisites>
+    </topic>
+</topics>"""
+
+DEFAULT_CARDS = """<card>
+    <question>What is the sample topic?</question>
+    <answer>A placeholder answer.</answer>
+    <extra>Produced by FakeOpenAI.</extra>
+</card>"""
+
+
+def load_transcript(path: str) -> Dict[str, List[str]]:
+    """Reads a transcript written with TRANSCRIPT_PATH into {agent: [responses in order]}."""
+    transcript = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                transcript[entry["agent"]].append(entry["content"])
+    return dict(transcript)
+
+
+def _pieces(text: str, size: int = 8):
+    """Splits text into token-sized deltas for fake streaming."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+# Fake LLM for Offline Runs
+class FakeOpenAI(TracedOpenAI):
+    """
+    Drop-in OpenAI replacement that never touches the network.
+
+    Replies come from ``transcript`` (a recorded run, see load_transcript) for
+    the agent currently running, and are otherwise scripted from the agent's
+    system prompt. Every call sleeps for ``latency`` seconds, so concurrency and
+    throughput can be measured locally. Only the transport-level methods are
+    replaced, so tracing and callbacks run as they would for the real client.
+    Token counts are estimated from text length unless ``prompt_tokens`` or
+    ``completion_tokens`` is set. Provider prompt caching is simulated: the
+    longest run of leading messages sent before is reported as cached tokens,
+    in 128-token blocks once it reaches ``prefix_cache_min_tokens``, and
+    ``prefill_per_1k`` adds that many seconds per 1k uncached prompt tokens
+    before the first token.
+    Install it with ``utils.override_shared_llm(FakeOpenAI(latency=0.2))``.
+    """
+
+    latency: float = 0.0
+    topics: str = DEFAULT_TOPICS
+    cards: str = DEFAULT_CARDS
+    transcript: Dict[str, List[str]] = {}
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    calls: int = 0
+    prefix_cache_min_tokens: int = 1024
+    prefill_per_1k: float = 0.0
+    _replayed: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _prefixes: set = PrivateAttr(default_factory=set)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault("model", "gpt-4o-mini")
+        kwargs.setdefault("api_key", "fake")
+        super().__init__(**kwargs)
+
+    def reply(self, messages: Sequence[ChatMessage]) -> str:
+        agent = current_agent.get()
+        with self._lock:
+            position = self._replayed.get(agent, 0)
+            if position < len(self.transcript.get(agent, ())):
+                self._replayed[agent] = position + 1
+                return self.transcript[agent][position]
+        system_prompt = next(
+            (m.content or "" for m in messages if str(getattr(m.role, "value", m.role)) == "system"),
+            "",
+        )
+        if "Orchestrator agent" in system_prompt:
+            return "END"
+        if "Topic Analyzer agent" in system_prompt:
+            return self.topics
+        if any(f"{name} agent" in system_prompt for name in ("Reviewer", "Code and Extra Field Expert", "Formatter")):
+            # Later stages hand the cards they were given back unchanged
+            given = CARD_RE.findall(messages[-1].content or "") if messages else []
+            if given:
+                return "\n".join(given)
+        return self.cards
+
+    def cached_prefix_tokens(self, messages: Sequence[ChatMessage]) -> int:
+        digest = hashlib.sha256()
+        prefix_tokens, cached = 0, 0
+        with self._lock:
+            for message in messages:
+                digest.update(f"{getattr(message.role, 'value', message.role)}\0{message.content or ''}\0".encode("utf-8"))
+                prefix_tokens += estimate_tokens(message.content or "")
+                key = digest.hexdigest()
+                if key in self._prefixes:
+                    cached = prefix_tokens
+                self._prefixes.add(key)
+        return cached // 128 * 128 if cached >= self.prefix_cache_min_tokens else 0
+
+    def _respond(self, messages: Sequence[ChatMessage]) -> ChatResponse:
+        with self._lock:
+            self.calls += 1
+        reply = self.reply(messages)
+        prompt_tokens = self.prompt_tokens
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(m.content or "") for m in messages)
+        completion_tokens = self.completion_tokens
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(reply)
+        return ChatResponse(
+            message=ChatMessage(role="assistant", content=reply),
+            additional_kwargs={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": self.cached_prefix_tokens(messages)},
+            },
+        )
+
+    def prefill_seconds(self, response: ChatResponse) -> float:
+        usage = response.additional_kwargs
+        uncached = usage["prompt_tokens"] - usage["prompt_tokens_details"]["cached_tokens"]
+        return max(uncached, 0) / 1000 * self.prefill_per_1k
+
+    def _chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        response = self._respond(messages)
+        time.sleep(self.latency + self.prefill_seconds(response))
+        return response
+
+    async def _achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        response = self._respond(messages)
+        await asyncio.sleep(self.latency + self.prefill_seconds(response))
+        return response
+
+    def _stream_pieces(self, response: ChatResponse):
+        """(delay, chunk) pairs of a streamed response; the last chunk carries the usage."""
+        pieces = _pieces(response.message.content)
+        content = ""
+        for i, delta in enumerate(pieces):
+            content += delta
+            delay = self.latency / 10 + (self.prefill_seconds(response) if i == 0 else 0.0)
+            usage = response.additional_kwargs if i == len(pieces) - 1 else {}
+            yield delay, ChatResponse(message=ChatMessage(role="assistant", content=content), delta=delta, additional_kwargs=usage)
+
+    def _stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any):
+        response = self._respond(messages)
+
+        def gen():
+            for delay, chunk in self._stream_pieces(response):
+                time.sleep(delay)
+                yield chunk
+
+        return gen()
+
+    async def _astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any):
+        response = self._respond(messages)
+
+        async def gen():
+            for delay, chunk in self._stream_pieces(response):
+                await asyncio.sleep(delay)
+                yield chunk
+
+        return gen()
+
+    def structured_predict(self, output_cls: Any, prompt: Any, **kwargs: Any) -> Any:
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        return output_cls.model_validate(
+            {"cards": [{"question": "What is the sample topic?", "answer": "A placeholder answer.", "extra": ""}]}
+        )
+
+    async def astructured_predict(self, output_cls: Any, prompt: Any, **kwargs: Any) -> Any:
+        await asyncio.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        return output_cls.model_validate(
+            {"cards": [{"question": "What is the sample topic?", "answer": "A placeholder answer.", "extra": ""}]}
+        )
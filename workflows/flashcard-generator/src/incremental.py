@@ -0,0 +1,110 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from chunking import HEADING_RE, FENCE_RE, split_into_chunks
+
+
+# Sections
+def split_sections(text: str, max_tokens: int = 2000) -> List[str]:
+    """
+    Splits text at headings (outside code fences). Unlike split_into_chunks the
+    boundaries do not depend on how much text precedes a section, so an edit
+    only changes the fingerprints of the sections it touches. Sections larger
+    than max_tokens are split further.
+    """
+    sections, current = [], []
+    in_fence = False
+    for line in text.splitlines():
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and HEADING_RE.match(line) and any(l.strip() for l in current):
+            sections.append("\n".join(current).strip("\n"))
+            current = []
+        current.append(line)
+    if any(l.strip() for l in current):
+        sections.append("\n".join(current).strip("\n"))
+
+    bounded = []
+    for section in sections:
+        bounded.extend(split_into_chunks(section, max_tokens=max_tokens))
+    return bounded
+
+
+def section_fingerprint(section: str) -> str:
+    """Content hash that ignores whitespace-only edits."""
+    return hashlib.sha256(" ".join(section.split()).encode("utf-8")).hexdigest()
+
+
+# Section Index
+class SectionIndex:
+    """
+    On-disk map from each document's section fingerprints to the cards they
+    produced, so unchanged sections can reuse their cards on the next run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sections ("
+            " doc_id TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " cards TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (doc_id, fingerprint))"
+        )
+        self._conn.commit()
+
+    def load(self, doc_id: str) -> Dict[str, List[dict]]:
+        """Returns {fingerprint: cards} for every indexed section of doc_id."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT fingerprint, cards FROM sections WHERE doc_id = ?", (doc_id,)
+            ).fetchall()
+        return {fingerprint: json.loads(cards) for fingerprint, cards in rows}
+
+    def replace(self, doc_id: str, sections: List[tuple]) -> None:
+        """Replaces doc_id's index with (fingerprint, cards) pairs in section order."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM sections WHERE doc_id = ?", (doc_id,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sections (doc_id, fingerprint, position, cards, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (doc_id, fingerprint, position, json.dumps(cards), now)
+                    for position, (fingerprint, cards) in enumerate(sections)
+                ],
+            )
+            self._conn.commit()
+
+    def provenance(self, doc_id: str) -> List[dict]:
+        """Cards of doc_id in section order, each tagged with its section fingerprint."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT fingerprint, cards FROM sections WHERE doc_id = ? ORDER BY position",
+                (doc_id,),
+            ).fetchall()
+        return [
+            {**card, "section": fingerprint}
+            for fingerprint, cards in rows
+            for card in json.loads(cards)
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def diff_sections(sections: List[str], indexed: Dict[str, List[dict]]) -> tuple:
+    """Returns (fingerprints in order, fingerprints needing generation, number of deleted sections)."""
+    fingerprints = [section_fingerprint(section) for section in sections]
+    changed = [fp for fp in dict.fromkeys(fingerprints) if fp not in indexed]
+    deleted = len(set(indexed) - set(fingerprints))
+    return fingerprints, changed, deleted
@@ -0,0 +1,129 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.llms import ChatMessage
+from agents import Speaker
+from chunking import get_token_counter
+
+# Which speakers' turns each agent gets to see. The deck and topics are already
+# sent in each agent's user message, so most agents only need their own history.
+SPEAKER_SCOPES: Dict[str, Optional[Tuple[str, ...]]] = {
+    Speaker.ORCHESTRATOR.value: None,  # every turn, compacted
+    Speaker.TOPIC_ANALYZER.value: (Speaker.TOPIC_ANALYZER.value,),
+    Speaker.QA_GENERATOR.value: (Speaker.QA_GENERATOR.value,),
+    Speaker.REVIEWER.value: (),
+    Speaker.CODE_AND_EXTRA_FIELD_EXPERT.value: (),
+    Speaker.FORMATTER.value: (),
+}
+
+
+def digest(entries: Sequence[Tuple[str, ChatMessage]], max_chars: int = 200) -> str:
+    """Local, LLM-free summary: the first max_chars of each turn, labelled by speaker."""
+    lines = []
+    for speaker, message in entries:
+        content = " ".join((message.content or "").split())
+        if len(content) > max_chars:
+            content = content[:max_chars] + " ..."
+        lines.append(f"- {speaker}: {content}")
+    return "\n".join(lines)
+
+
+# Scoped Memory
+class ScopedMemory:
+    """
+    Chat memory that hands each Speaker only the turns in its scope.
+
+    Once a view grows past ``compact_threshold`` tokens, everything except the
+    last ``keep_recent`` turns is replaced by one summary message (``summarize``
+    defaults to a local digest). Views are finally trimmed to ``token_limit``,
+    like ChatMemoryBuffer. Token counters compare what was sent with what a
+    single shared ChatMemoryBuffer(token_limit) would have sent.
+    """
+
+    def __init__(
+        self,
+        token_limit: int = 8000,
+        compact_threshold: int = 1500,
+        keep_recent: int = 2,
+        summarize: Optional[Callable[[Sequence[Tuple[str, ChatMessage]]], str]] = None,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ):
+        self.token_limit = token_limit
+        self.compact_threshold = compact_threshold
+        self.keep_recent = keep_recent
+        self.summarize = summarize or digest
+        self.count_tokens = count_tokens or get_token_counter()
+        self.baseline_tokens = 0
+        self.sent_tokens = 0
+        self._entries: List[Tuple[str, ChatMessage, int]] = []
+        self._summaries: Dict[Tuple, ChatMessage] = {}
+
+    def put(self, message: ChatMessage, speaker: str = "") -> None:
+        self._entries.append((speaker, message, self.count_tokens(message.content or "")))
+
+    def get(self, speaker: Optional[str] = None) -> List[ChatMessage]:
+        scope = SPEAKER_SCOPES.get(speaker) if speaker is not None else None
+        entries = [e for e in self._entries if scope is None or e[0] in scope]
+        messages = self._trim(self._compact(entries, scope))
+
+        self.baseline_tokens += self._buffer_tokens([tokens for _, _, tokens in self._entries])
+        self.sent_tokens += sum(self.count_tokens(m.content or "") for m in messages)
+        return messages
+
+    def get_all(self) -> List[ChatMessage]:
+        return [message for _, message, _ in self._entries]
+
+    def set(self, entries: Sequence[Tuple[str, ChatMessage]]) -> None:
+        self._entries = []
+        self._summaries = {}
+        for speaker, message in entries:
+            self.put(message, speaker=speaker)
+
+    def dump(self) -> List[dict]:
+        """JSON-serializable copy of the stored turns, for checkpoints."""
+        return [
+            {"speaker": speaker, "role": str(getattr(message.role, "value", message.role)), "content": message.content}
+            for speaker, message, _ in self._entries
+        ]
+
+    def load(self, entries: Sequence[dict]) -> None:
+        self.set([(e["speaker"], ChatMessage(role=e["role"], content=e["content"])) for e in entries])
+
+    def reset(self) -> None:
+        self.set([])
+
+    def _compact(self, entries: List[Tuple[str, ChatMessage, int]], scope) -> List[ChatMessage]:
+        if sum(tokens for _, _, tokens in entries) <= self.compact_threshold or len(entries) <= self.keep_recent:
+            return [message for _, message, _ in entries]
+
+        # Not entries[:-keep_recent], which is empty for keep_recent=0
+        split = len(entries) - self.keep_recent
+        older, recent = entries[:split], entries[split:]
+        key = (scope, len(older))
+        if key not in self._summaries:
+            summary = self.summarize([(s, m) for s, m, _ in older])
+            self._summaries[key] = ChatMessage(role="system", content=f"Summary of earlier turns:\n{summary}")
+        return [self._summaries[key]] + [message for _, message, _ in recent]
+
+    def _trim(self, messages: List[ChatMessage]) -> List[ChatMessage]:
+        kept, total = [], 0
+        for message in reversed(messages):
+            total += self.count_tokens(message.content or "")
+            if total > self.token_limit:
+                break
+            kept.append(message)
+        return list(reversed(kept))
+
+    def _buffer_tokens(self, token_counts: List[int]) -> int:
+        total = 0
+        for tokens in reversed(token_counts):
+            if total + tokens > self.token_limit:
+                break
+            total += tokens
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "baseline_prompt_tokens": self.baseline_tokens,
+            "sent_prompt_tokens": self.sent_tokens,
+            "saved_prompt_tokens": self.baseline_tokens - self.sent_tokens,
+        }
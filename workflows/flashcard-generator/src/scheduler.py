@@ -0,0 +1,101 @@
+from typing import Optional
+from agents import Speaker, borrow_agent, state_message
+from utils import get_tracer
+
+END = "END"
+
+
+# Deterministic Transitions
+def next_speaker_from_state(state: dict) -> Optional[str]:
+    """
+    Returns the next agent when it follows directly from the state, or None
+    when the choice needs the LLM orchestrator's judgement.
+    """
+    if state["formatting_status"] == "completed":
+        return END
+    if state["topics"] == "":
+        return Speaker.TOPIC_ANALYZER.value
+    if state["qa_cards"] == "":
+        return Speaker.QA_GENERATOR.value
+    if state["review_status"] == "pending":
+        return Speaker.REVIEWER.value
+    return None
+
+
+# Hybrid Scheduler
+class Scheduler:
+    """
+    Picks the next agent for the flashcard loop.
+
+    Obvious transitions are decided locally from the state; only ambiguous
+    states are sent to the LLM orchestrator. After ``max_iterations`` decisions
+    the scheduler always answers END.
+    """
+
+    def __init__(self, max_iterations: int = 12, rate_limiter=None):
+        self.max_iterations = max_iterations
+        self.rate_limiter = rate_limiter
+        self.iterations = 0
+        self.local_decisions = 0
+        self.llm_decisions = 0
+        # State sent with the last orchestrator request, to mark what changed since
+        self._last_state: Optional[dict] = None
+
+    def _local_decision(self, state: dict) -> Optional[str]:
+        self.iterations += 1
+        if self.iterations > self.max_iterations:
+            print(f"\nReached the limit of {self.max_iterations} iterations")
+            return END
+
+        next_agent = next_speaker_from_state(state)
+        if next_agent is not None:
+            self.local_decisions += 1
+            return next_agent
+
+        self.llm_decisions += 1
+        return None
+
+    def _request(self, state: dict) -> str:
+        # The state trails the request, after the static system prompt and history
+        message = "Decide which agent to run next based on the current state.\n\n" + state_message(state, self._last_state)
+        self._last_state = dict(state)
+        return message
+
+    def next_speaker(self, state: dict, memory) -> str:
+        next_agent = self._local_decision(state)
+        if next_agent is not None:
+            return next_agent
+
+        with borrow_agent(Speaker.ORCHESTRATOR.value) as orchestrator, get_tracer().span(Speaker.ORCHESTRATOR.value):
+            response = orchestrator.chat(
+                self._request(state),
+                chat_history=memory.get(Speaker.ORCHESTRATOR.value)
+            )
+        return str(response).strip().strip('"').strip("'")
+
+    async def anext_speaker(self, state: dict, memory) -> str:
+        next_agent = self._local_decision(state)
+        if next_agent is not None:
+            return next_agent
+
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        with borrow_agent(Speaker.ORCHESTRATOR.value) as orchestrator, get_tracer().span(Speaker.ORCHESTRATOR.value):
+            response = await orchestrator.achat(
+                self._request(state),
+                chat_history=memory.get(Speaker.ORCHESTRATOR.value)
+            )
+        return str(response).strip().strip('"').strip("'")
+
+    def load(self, stats: dict) -> None:
+        """Restores counters saved from stats(), e.g. when resuming a checkpoint."""
+        self.iterations = stats.get("iterations", 0)
+        self.local_decisions = stats.get("local_decisions", 0)
+        self.llm_decisions = stats.get("llm_decisions", 0)
+
+    def stats(self) -> dict:
+        return {
+            "iterations": self.iterations,
+            "local_decisions": self.local_decisions,
+            "llm_decisions": self.llm_decisions,
+        }
@@ -0,0 +1,70 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List
+
+from card_parser import CARD_RE, parse_cards
+from tracing import bind_context
+
+
+# Deck Sharding
+def split_card_shards(qa_cards: str, shard_size: int = 5) -> List[str]:
+    """Splits a deck into shards of up to shard_size raw <card> elements, in order."""
+    cards = CARD_RE.findall(qa_cards)
+    return ["\n".join(cards[i:i + shard_size]) for i in range(0, len(cards), shard_size)]
+
+
+def is_valid_shard_response(response: str) -> bool:
+    """A shard response is usable if it contains at least one recoverable card."""
+    cards, _ = parse_cards(response)
+    return len(cards) > 0
+
+
+# Shard Execution
+def run_shards(
+    shards: List[str],
+    process: Callable[[str], str],
+    max_workers: int = 4,
+    retries: int = 2,
+) -> List[str]:
+    """
+    Runs process over every shard on a bounded thread pool and returns the
+    results in shard order. A shard whose call fails or returns no cards is
+    retried on its own; after ``retries`` extra attempts the original shard is
+    kept so one bad response cannot damage the rest of the deck.
+    """
+    def attempt(shard: str) -> str:
+        for _ in range(retries + 1):
+            try:
+                response = process(shard)
+                if is_valid_shard_response(response):
+                    return response
+                print("\nShard response contained no cards, retrying")
+            except Exception as e:
+                print(f"\nError processing shard: {str(e)}")
+        return shard
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(bind_context(attempt), shards))
+
+
+async def arun_shards(
+    shards: List[str],
+    process: Callable[[str], Awaitable[str]],
+    max_workers: int = 4,
+    retries: int = 2,
+) -> List[str]:
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def attempt(shard: str) -> str:
+        async with semaphore:
+            for _ in range(retries + 1):
+                try:
+                    response = await process(shard)
+                    if is_valid_shard_response(response):
+                        return response
+                    print("\nShard response contained no cards, retrying")
+                except Exception as e:
+                    print(f"\nError processing shard: {str(e)}")
+            return shard
+
+    return list(await asyncio.gather(*(attempt(shard) for shard in shards)))
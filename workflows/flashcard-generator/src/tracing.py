@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Optional, Sequence
+
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse
+from llama_index.llms.openai import OpenAI
+from pydantic import PrivateAttr
+from workflow_common.tracing import Tracer, bind_context, current_agent, current_run, percentile, run_scope  # noqa: F401
+
+# AgentPool of the run in progress (see agents.py); without one every step builds its agents
+current_agent_pool: ContextVar[Optional[Any]] = ContextVar("current_agent_pool", default=None)
+
+
+# Traced LLM
+def response_usage(response: ChatResponse) -> dict:
+    """Token usage of a response; llama_index's additional_kwargs win over the raw API usage."""
+    usage = getattr(response, "additional_kwargs", None) or {}
+    if getattr(response, "raw", None) is not None:
+        raw_usage = getattr(response.raw, "usage", None) or (response.raw.get("usage") if isinstance(response.raw, dict) else None)
+        if raw_usage is not None:
+            usage = {**(raw_usage if isinstance(raw_usage, dict) else raw_usage.model_dump()), **usage}
+    return usage
+
+
+def response_token_counts(response: ChatResponse) -> tuple:
+    usage = response_usage(response)
+    return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+
+
+def response_cached_tokens(response: ChatResponse) -> int:
+    """Prompt tokens the provider read from its prompt cache (prompt_tokens_details.cached_tokens)."""
+    details = response_usage(response).get("prompt_tokens_details") or {}
+    return details.get("cached_tokens", 0) or 0
+
+
+def record_usage(span: dict, response: ChatResponse) -> None:
+    span["prompt_tokens"], span["completion_tokens"] = response_token_counts(response)
+    span["cached_tokens"] = response_cached_tokens(response)
+
+
+_transcript_lock = threading.Lock()
+
+
+class TracedOpenAI(OpenAI):
+    """
+    OpenAI LLM that records a span with latency and token usage for every chat call.
+
+    With ``transcript_path`` every response is also appended as a JSON line
+    ``{"agent": ..., "content": ...}``, which FakeOpenAI can replay offline.
+    """
+
+    transcript_path: Optional[str] = None
+    _tracer: Optional[Tracer] = PrivateAttr(default=None)
+
+    def __init__(self, tracer: Optional[Tracer] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._tracer = tracer
+
+    @property
+    def tracer(self) -> Optional[Tracer]:
+        return self._tracer
+
+    def _record_transcript(self, response: ChatResponse) -> None:
+        if self.transcript_path:
+            line = json.dumps({"agent": current_agent.get(), "content": response.message.content})
+            with _transcript_lock, open(self.transcript_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        if self._tracer is None:
+            response = super().chat(messages, **kwargs)
+        else:
+            with self._tracer.span("llm", kind="llm") as span:
+                response = super().chat(messages, **kwargs)
+                record_usage(span, response)
+        self._record_transcript(response)
+        return response
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        if self._tracer is None:
+            response = await super().achat(messages, **kwargs)
+        else:
+            with self._tracer.span("llm", kind="llm") as span:
+                response = await super().achat(messages, **kwargs)
+                record_usage(span, response)
+        self._record_transcript(response)
+        return response
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any):
+        started = time.perf_counter()
+        stream = super().stream_chat(messages, **kwargs)
+        return stream if self._tracer is None else self._traced_stream(stream, started)
+
+    def _traced_stream(self, stream, started: float):
+        with self._tracer.span("llm", kind="llm") as span:
+            response = None
+            for response in stream:
+                span.setdefault("ttft_s", time.perf_counter() - started)
+                yield response
+            if response is not None:
+                record_usage(span, response)
+
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any):
+        started = time.perf_counter()
+        stream = await super().astream_chat(messages, **kwargs)
+        return stream if self._tracer is None else self._atraced_stream(stream, started)
+
+    async def _atraced_stream(self, stream, started: float):
+        with self._tracer.span("llm", kind="llm") as span:
+            response = None
+            async for response in stream:
+                span.setdefault("ttft_s", time.perf_counter() - started)
+                yield response
+            if response is not None:
+                record_usage(span, response)
+
+    def record_cache_hit(self) -> None:
+        if self._tracer is not None:
+            with self._tracer.span("llm", kind="llm", cache_hits=1):
+                pass
@@ -1,25 +1,149 @@
 import os
-from llama_index.llms.openai import OpenAI
-from llama_index.core.memory import ChatMemoryBuffer
+from functools import lru_cache
+from typing import List, Tuple
 from tenacity import retry, stop_after_attempt, wait_exponential, TryAgain
 from llama_index.core.prompts import ChatPromptTemplate 
 from llama_index.core.llms import ChatMessage
 import xml.etree.ElementTree as ET
-from models import Flashcard_model
+from models import Flashcard_model, QACard
+from cache import CachedOpenAI, ResponseCache
+from card_parser import parse_cards
+from checkpoint import CheckpointStore
+from incremental import SectionIndex
+from dedup import DuplicateIndex, dedupe_cards
+from tracing import Tracer, TracedOpenAI
+from workflow_common.gateway import get_async_http_client, get_http_client
 
 # LLM Configuration
+_llm_override = None
+
+def override_shared_llm(llm) -> None:
+    """Makes get_shared_llm return llm (e.g. a FakeOpenAI); pass None to restore the default."""
+    global _llm_override
+    _llm_override = llm
+
 def get_shared_llm():
     """Returns a shared LLM instance for all agents."""
+    if _llm_override is not None:
+        return _llm_override
     api_base = os.getenv("API_BASE")
     api_key = os.getenv("API_KEY")
     model = os.getenv("MODEL")
     temperature = float(os.getenv("TEMPERATURE"))
 
-    return OpenAI(model=model, temperature=temperature, api_base=api_base, api_key=api_key)
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        return CachedOpenAI(
+            response_cache,
+            model=model,
+            temperature=temperature,
+            api_base=api_base,
+            api_key=api_key,
+            tracer=get_tracer(),
+            transcript_path=os.getenv("TRANSCRIPT_PATH"),
+            cache_nondeterministic=os.getenv("LLM_CACHE_NONDETERMINISTIC", "").lower() in ("1", "true", "yes"),
+            http_client=get_http_client(),
+            async_http_client=get_async_http_client(),
+        )
+    return TracedOpenAI(
+        tracer=get_tracer(),
+        transcript_path=os.getenv("TRANSCRIPT_PATH"),
+        model=model,
+        temperature=temperature,
+        api_base=api_base,
+        api_key=api_key,
+        # All LLM instances share the gateway's connection pool, rate limits and concurrency limit
+        http_client=get_http_client(),
+        async_http_client=get_async_http_client(),
+    )
+
+# Instrumentation
+@lru_cache(maxsize=None)
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer; TRACE_PATH and METRICS_PATH enable the file outputs."""
+    return Tracer(trace_path=os.getenv("TRACE_PATH"), metrics_path=os.getenv("METRICS_PATH"), prefix="flashcard")
+
+# Response Cache Configuration
+@lru_cache(maxsize=None)
+def get_response_cache():
+    """Returns the process-wide response cache, or None when LLM_CACHE_PATH is unset."""
+    path = os.getenv("LLM_CACHE_PATH")
+    if not path:
+        return None
+    max_age = os.getenv("LLM_CACHE_MAX_AGE")
+    return ResponseCache(
+        path,
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+        max_memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256")),
+        max_age_seconds=float(max_age) if max_age else None,
+    )
+
+# Checkpoint Configuration
+@lru_cache(maxsize=None)
+def get_checkpoint_store():
+    """Returns the process-wide checkpoint store, or None when CHECKPOINT_PATH is unset."""
+    path = os.getenv("CHECKPOINT_PATH")
+    return CheckpointStore(path) if path else None
+
+# Section Index Configuration
+@lru_cache(maxsize=None)
+def get_section_index():
+    """Returns the process-wide section index, or None when SECTION_INDEX_PATH is unset."""
+    path = os.getenv("SECTION_INDEX_PATH")
+    return SectionIndex(path) if path else None
+
+# Duplicate Index Configuration
+@lru_cache(maxsize=None)
+def get_duplicate_index():
+    """Returns the persistent near-duplicate index, or None when DEDUP_INDEX_PATH is unset."""
+    path = os.getenv("DEDUP_INDEX_PATH")
+    if not path:
+        return None
+    return DuplicateIndex(path, threshold=float(os.getenv("DEDUP_THRESHOLD", "0.7")))
 
 # Enhanced Error Handling and Validation
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+def parse_locally(message: str) -> Tuple[List[QACard], str]:
+    """
+    Parses <card> elements locally. Returns the cards and the text the LLM
+    still has to transform: the non-blank fragments the parser could not
+    recover, the whole message if it contains no cards, or "" if there is
+    nothing left (including for a blank message).
+    """
+    if not message.strip():
+        return [], ""
+    cards, unparsed = parse_cards(message)
+    unparsed = [fragment for fragment in unparsed if fragment.strip()]
+    if not cards and not unparsed:
+        unparsed = [message]
+    if unparsed:
+        print(f"Falling back to the LLM for {len(unparsed)} unparsed fragment(s)")
+    return cards, "\n".join(unparsed)
+
 def validate_and_transform(message: str) -> dict:
+    """
+    Parses <card> elements locally and only sends the non-blank fragments the
+    parser could not recover (or the whole message, if it contains no cards) to
+    the LLM. A blank message gives an empty deck. Near-duplicate cards are
+    dropped before returning.
+    """
+    cards, unparsed = parse_locally(message)
+    if unparsed:
+        cards += llm_transform(unparsed).cards
+    return Flashcard_model(cards=dedupe_cards(cards)).model_dump()
+
+async def avalidate_and_transform(message: str) -> dict:
+    """Async counterpart of validate_and_transform, built on allm_transform."""
+    cards, unparsed = parse_locally(message)
+    if unparsed:
+        cards += (await allm_transform(unparsed)).cards
+    return Flashcard_model(cards=dedupe_cards(cards)).model_dump()
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, min=4, max=10),
+    before_sleep=lambda _: get_tracer().record_retry(),
+)
+def llm_transform(message: str) -> Flashcard_model:
     try:
         # Transform to structured data
         chat_prompt_tmpl = ChatPromptTemplate(
@@ -27,11 +151,10 @@ def validate_and_transform(message: str) -> dict:
                 ChatMessage.from_str(message, role="user")
             ]
         )
-        structured_data = get_shared_llm().structured_predict(
+        return get_shared_llm().structured_predict(
             Flashcard_model, 
             chat_prompt_tmpl
         )
-        return structured_data.model_dump()
         
     except ET.ParseError as e:
         print(f"XML validation error: {str(e)}")
@@ -39,10 +162,38 @@ def validate_and_transform(message: str) -> dict:
     except Exception as e:
         print(f"Transformation error: {str(e)}")
         raise TryAgain
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, min=4, max=10),
+    before_sleep=lambda _: get_tracer().record_retry(),
+)
+async def allm_transform(message: str) -> Flashcard_model:
+    try:
+        chat_prompt_tmpl = ChatPromptTemplate(
+            message_templates=[
+                ChatMessage.from_str(message, role="user")
+            ]
+        )
+        return await get_shared_llm().astructured_predict(
+            Flashcard_model, 
+            chat_prompt_tmpl
+        )
+        
+    except Exception as e:
+        print(f"Transformation error: {str(e)}")
+        raise TryAgain
     
 # Memory Management
-def setup_memory() -> ChatMemoryBuffer:
-    return ChatMemoryBuffer.from_defaults(token_limit=8000)
+def setup_memory():
+    """Returns per-Speaker scoped memory that compacts older turns."""
+    # Imported here because memory -> agents -> utils would otherwise be circular
+    from memory import ScopedMemory
+
+    return ScopedMemory(
+        token_limit=8000,
+        compact_threshold=int(os.getenv("MEMORY_COMPACT_THRESHOLD", "1500")),
+    )
 
 # Enhanced State Management
 def get_initial_state(text: str) -> dict:
@@ -0,0 +1,158 @@
+"""
+Offline benchmark of the Researcher / Chart Generator graph against FakeChatModel.
+
+Each run scripts ``rounds`` hand-offs (the Researcher searches the fixture backend
+and sends ``rows`` data points, the Chart Generator runs python_repl and hands
+back) before FINAL ANSWER. With --by-reference the Researcher saves the rows with
+store_table and the Chart Generator loads them by handle and plots them; from
+the third run on (once the same program was written twice), the chart template
+cache draws the chart without the Chart Generator's LLM turns (see "cached").
+Each run reports wall time, LLM calls, prompt tokens (total, first and last
+call) and peak Python memory. LLM calls and prompt tokens are deterministic, so --baseline can flag
+regressions in loop overhead or prompt growth between commits.
+
+Usage: python benchmarks/graph.py [--rounds 1 4 16] [--rows 5 50 500]
+                                  [--by-reference] [--latency 0] [--transcript run.jsonl]
+                                  [--json out.json] [--baseline out.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+# Agents run on FakeChatModel, so no OpenAI client is built; search uses fixtures
+os.environ.setdefault("SEARCH_BACKEND", "fixture")
+os.environ.setdefault("SEARCH_FIXTURES", os.path.join(ROOT, "benchmarks", "search_fixtures.json"))
+os.environ.setdefault("ARTIFACT_DIR", tempfile.mkdtemp(prefix="gdp_artifacts_"))
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from fake_llm import FakeChatModel, load_transcript  # noqa: E402
+from agents import create_agents  # noqa: E402
+from artifacts import get_artifact_store  # noqa: E402
+from tracing import get_tracer  # noqa: E402
+from workflow import build_graph  # noqa: E402
+
+TASK = "Fetch the Malaysia's GDP over the past 5 years, then draw a line graph of it. Once you code it up, finish."
+
+
+def make_script(rounds: int, rows: int, by_reference: bool = False) -> dict:
+    years = [2000 + i for i in range(rows)]
+    values = [400 + i * 1.5 for i in range(rows)]
+    data = "\n".join(f"{year}: {value:.1f} billion USD" for year, value in zip(years, values))
+    code = f"values = [{', '.join(str(v) for v in values)}]\nprint(len(values), max(values))"
+    store = None
+    if by_reference:
+        columns = {"year": years, "gdp_usd_billion": values}
+        handle = get_artifact_store().put("malaysia_gdp", columns).handle
+        store = {"name": "store_table", "arguments": json.dumps({"name": "malaysia_gdp", "columns": columns})}
+        data = f"GDP table stored as artifact:{handle}"
+        code = (
+            f"import matplotlib.pyplot as plt\ndf = load_artifact('{handle}')\n"
+            "plt.plot(df['year'], df['gdp_usd_billion'])\nplt.title(df.attrs['name'])"
+        )
+    search = {"name": "tavily_search_results_json", "arguments": json.dumps({"query": "Malaysia GDP 2019-2023"})}
+    researcher = []
+    for r in range(rounds):
+        researcher.append({"content": "", "function_call": search})
+        if store:
+            researcher.append({"content": "", "function_call": store})
+        researcher.append({"content": f"GDP data, round {r}:\n{data}"})
+    chart = []
+    for r in range(rounds):
+        chart.append({
+            "content": "",
+            "function_call": {"name": "python_repl", "arguments": json.dumps({"code": code})},
+        })
+        chart.append({"content": "FINAL ANSWER" if r == rounds - 1 else f"Chart {r} drawn, need more data."})
+    return {"Researcher": researcher, "Chart Generator": chart}
+
+
+def run(rounds: int, rows: int, latency: float, transcript: dict, by_reference: bool = False) -> dict:
+    tracer = get_tracer()
+    tracer.reset()
+    llm = FakeChatModel(script=transcript or make_script(rounds, rows, by_reference), latency=latency)
+    graph = build_graph(*create_agents(llm))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in graph.stream({"messages": [HumanMessage(content=TASK)]}, {"recursion_limit": 150}):
+            pass
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    calls = sorted((s for s in tracer.spans if s["kind"] == "llm"), key=lambda s: s["start"])
+    per_call = [s["prompt_tokens"] for s in calls]
+    return {
+        "rounds": rounds,
+        "rows": rows,
+        "seconds": elapsed,
+        "llm_calls": llm.calls,
+        "tool_calls": sum(s["kind"] == "tool" for s in tracer.spans),
+        "cached_charts": sum(s["name"] == "chart_cache" for s in tracer.spans),
+        "prompt_tokens": sum(per_call),
+        "call_prompt_tokens": per_call,
+        "peak_mb": peak / 1e6,
+    }
+
+
+def check_baseline(results: list, path: str, tolerance: float) -> list:
+    with open(path, encoding="utf-8") as f:
+        baseline = {(r["rounds"], r["rows"]): r for r in json.load(f)}
+    regressions = []
+    for r in results:
+        before = baseline.get((r["rounds"], r["rows"]))
+        if before is None:
+            continue
+        for metric in ("llm_calls", "prompt_tokens"):
+            if r[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"rounds={r['rounds']} rows={r['rows']}: {metric} {before[metric]} -> {r[metric]}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rows", type=int, nargs="+", default=[5, 50, 500])
+    parser.add_argument("--by-reference", action="store_true", help="hand the data over as an artifact handle")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--transcript", help="JSONL transcript recorded with TRANSCRIPT_PATH (replaces the script)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="fail if LLM calls or prompt tokens grew past a previous --json file")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    transcript = load_transcript(args.transcript) if args.transcript else {}
+    results = []
+    print(f"{'rounds':>6} {'rows':>5} {'seconds':>8} {'llm':>5} {'tools':>5} {'prompt':>8} {'first call':>10} {'last call':>10} {'cached':>6} {'peak MB':>8}")
+    for rounds in args.rounds:
+        for rows in args.rows:
+            r = run(rounds, rows, args.latency, transcript, args.by_reference)
+            results.append(r)
+            per_call = r["call_prompt_tokens"] or [0]
+            print(
+                f"{rounds:>6} {rows:>5} {r['seconds']:>8.2f} {r['llm_calls']:>5} {r['tool_calls']:>5}"
+                f" {r['prompt_tokens']:>8} {per_call[0]:>10} {per_call[-1]:>10} {r['cached_charts']:>6} {r['peak_mb']:>8.1f}"
+            )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        regressions = check_baseline(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Offline load test of the async chart service against FakeChatModel.
+
+Sends ``--requests`` chart requests from ``--clients`` concurrent callers to a
+ChartService with ``--concurrency`` run slots and a ``--max-queue`` wait queue.
+Each run searches the fixture backend, runs python_repl once and finishes. The
+report has requests per second, end-to-end latency percentiles, the deepest
+queue seen and the number of rejected (backpressured) requests.
+
+Usage: python benchmarks/service.py [--requests 64] [--clients 16]
+                                    [--concurrency 1 4 16] [--max-queue 32]
+                                    [--latency 0.2] [--json out.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+# Agents run on FakeChatModel, so no OpenAI client is built; search uses fixtures
+os.environ.setdefault("SEARCH_BACKEND", "fixture")
+os.environ.setdefault("SEARCH_FIXTURES", os.path.join(ROOT, "benchmarks", "search_fixtures.json"))
+
+from fake_llm import FakeChatModel  # noqa: E402
+from agents import create_agents  # noqa: E402
+from service import ChartService, ServiceOverloaded  # noqa: E402
+from tracing import get_tracer, percentile  # noqa: E402
+from workflow import build_graph  # noqa: E402
+
+TASK = "Fetch the Malaysia's GDP over the past 5 years, then draw a line graph of it. Once you code it up, finish."
+
+SCRIPT = {
+    "Researcher": [
+        {"content": "", "function_call": {
+            "name": "tavily_search_results_json", "arguments": json.dumps({"query": "Malaysia GDP 2019-2023"})}},
+        {"content": "2019: 365.2, 2020: 337.0, 2021: 373.0, 2022: 407.0, 2023: 399.7 billion USD"},
+    ],
+    "Chart Generator": [
+        {"content": "", "function_call": {
+            "name": "python_repl", "arguments": json.dumps({"code": "print(sum([365.2, 337.0, 373.0, 407.0, 399.7]))"})}},
+        {"content": "FINAL ANSWER"},
+    ],
+}
+
+
+async def client(service: ChartService, requests: asyncio.Queue, results: dict) -> None:
+    while True:
+        try:
+            requests.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        start = time.perf_counter()
+        try:
+            async with contextlib.aclosing(service.submit(TASK)) as events:
+                async for event in events:
+                    if event["event"] == "queued":
+                        results["max_queue_depth"] = max(results["max_queue_depth"], event["queue_depth"])
+                    elif event["event"] == "error":
+                        results["errors"] += 1
+        except ServiceOverloaded:
+            results["rejected"] += 1
+            # Back off briefly before the next request
+            await asyncio.sleep(0.05)
+            continue
+        results["latencies"].append(time.perf_counter() - start)
+
+
+async def run(requests: int, clients: int, concurrency: int, max_queue: int, latency: float) -> dict:
+    get_tracer().reset()
+    llm = FakeChatModel(script=SCRIPT, latency=latency)
+    service = ChartService(build_graph(*create_agents(llm)), max_concurrency=concurrency, max_queue=max_queue)
+    pending: asyncio.Queue = asyncio.Queue()
+    for _ in range(requests):
+        pending.put_nowait(None)
+    results = {"latencies": [], "errors": 0, "rejected": 0, "max_queue_depth": 0}
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(service, pending, results) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies = results.pop("latencies")
+    return {
+        "requests": requests,
+        "clients": clients,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "completed": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_s": percentile(latencies, 0.5),
+        "p95_s": percentile(latencies, 0.95),
+        "p99_s": percentile(latencies, 0.99),
+        "llm_calls": llm.calls,
+        **results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'slots':>5} {'done':>5} {'seconds':>8} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'queue':>5} {'rejected':>8} {'errors':>6}")
+    for concurrency in args.concurrency:
+        r = asyncio.run(run(args.requests, args.clients, concurrency, args.max_queue, args.latency))
+        results.append(r)
+        print(
+            f"{concurrency:>5} {r['completed']:>5} {r['seconds']:>8.2f} {r['rps']:>7.2f} {r['p50_s']:>7.2f}"
+            f" {r['p95_s']:>7.2f} {r['p99_s']:>7.2f} {r['max_queue_depth']:>5} {r['rejected']:>8} {r['errors']:>6}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
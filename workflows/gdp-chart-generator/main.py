@@ -1,23 +1,58 @@
-from dotenv import load_dotenv  
-from langchain_core.messages import HumanMessage
-from src.workflow import graph
+import os
+import uuid
 
-# Load environment variables from a .env file
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file, before any module reads its settings
 load_dotenv()
 
+from langchain_core.messages import HumanMessage  # noqa: E402
+from src.workflow import get_graph  # noqa: E402
+from checkpoint import can_resume, checkpoint_id, replay, run_config  # noqa: E402
+from workflow_common.gateway import get_gateway  # noqa: E402
+from workflow_common.governor import RunGovernor  # noqa: E402
+from tracing import get_tracer  # noqa: E402
+
+graph = get_graph()
+
+# One thread per request; reuse THREAD_ID to resume it, FORK_FROM to branch off an earlier step
+thread_id = os.getenv("THREAD_ID") or uuid.uuid4().hex
+# Maximum number of steps to take in the graph
+config = run_config(thread_id, checkpoint_id=os.getenv("FORK_FROM"), recursion_limit=150)
+print(f"Thread: {thread_id}")
+
+if os.getenv("REPLAY"):
+    # Print the saved steps of the thread without calling the LLM
+    for snapshot in replay(graph, thread_id):
+        print(checkpoint_id(snapshot), snapshot.metadata, snapshot.next)
+        print(snapshot.values["messages"][-1] if snapshot.values.get("messages") else snapshot.values)
+        print("----")
+    raise SystemExit
+
+inputs = {
+    "messages": [
+        HumanMessage(
+            content="Fetch the Malaysia's GDP over the past 5 years,"
+            " then draw a line graph of it."
+            " Once you code it up, finish."
+        )
+    ],
+}
+# Token, time, call and cost limits from RUN_MAX_* plus loop detection, checked by the router
+governor = RunGovernor()
+with governor.active():
+    # Passing no input continues from the last completed node of the checkpoint
+    for s in graph.stream(None if can_resume(graph, config) else inputs, config):
+        print(s)
+        print("----")
+if governor.stop_reason:
+    print(f"Stopped early: {governor.stop_reason}")
+print(f"Run budget: {governor.stats()}")
 
-for s in graph.stream(
-    {
-        "messages": [
-            HumanMessage(
-                content="Fetch the Malaysia's GDP over the past 5 years,"
-                " then draw a line graph of it."
-                " Once you code it up, finish."
-            )
-        ],
-    },
-    # Maximum number of steps to take in the graph
-    {"recursion_limit": 150},
-):
-    print(s)
-    print("----")
\ No newline at end of file
+# Per-agent timings and token usage for this run
+tracer = get_tracer()
+gateway = get_gateway()
+print(f"LLM gateway: {gateway.stats()}")
+gateway.export_metrics(tracer)
+tracer.write_prometheus()
+print(tracer.format_summary())
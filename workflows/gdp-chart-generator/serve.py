@@ -0,0 +1,26 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file, before any module reads its settings
+load_dotenv()
+
+from src.workflow import build_graph  # noqa: E402
+from agents import get_agents  # noqa: E402
+from checkpoint import get_async_checkpointer  # noqa: E402
+from service import ChartService, serve  # noqa: E402
+
+
+async def main():
+    # One graph and one LLM client for every request
+    research_agent, chart_agent = get_agents()
+    graph = build_graph(research_agent, chart_agent, checkpointer=get_async_checkpointer())
+    service = ChartService.from_env(graph)
+    host = os.getenv("SERVICE_HOST", "127.0.0.1")
+    port = int(os.getenv("SERVICE_PORT", "8765"))
+    print(f"Serving chart requests on {host}:{port}")
+    await serve(service, host, port)
+
+
+asyncio.run(main())
@@ -1,14 +1,16 @@
 import os
+from functools import lru_cache
 from langchain_openai import ChatOpenAI
-from langchain_core.utils.function_calling import convert_to_openai_function
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from tools import tavily_tool, python_repl
+from tools import get_search_tool, python_repl, store_table
+from workflow_common.gateway import get_async_http_client, get_http_client
 
-# Set API keys for OpenAI
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '<Your Default OpenAI API Key>')
-
-# LLM Setup for Agents (using OpenAI)
-llm = ChatOpenAI(api_key=OPENAI_API_KEY)
+# LLM Setup for Agents (using OpenAI), sending requests through the shared LLM gateway
+@lru_cache(maxsize=None)
+def get_llm():
+    """Returns the shared LLM, created on first use so the API key and LLM_GATEWAY_* settings come from the loaded .env."""
+    api_key = os.getenv('OPENAI_API_KEY', '<Your Default OpenAI API Key>')
+    return ChatOpenAI(api_key=api_key, http_client=get_http_client(), http_async_client=get_async_http_client())
 
 # Function to Create Agents
 def create_agent(llm, tools, system_message: str):
@@ -23,7 +25,6 @@ def create_agent(llm, tools, system_message: str):
     Returns:
     - The created agent configured with the provided tools and system message.
     """
-    functions = [convert_to_openai_function(t) for t in tools]
     prompt = ChatPromptTemplate.from_messages(
         [
             (
@@ -41,17 +42,34 @@ def create_agent(llm, tools, system_message: str):
     )
     prompt = prompt.partial(system_message=system_message)
     prompt = prompt.partial(tool_names=", ".join([tool.name for tool in tools]))
-    return prompt | llm.bind_functions(functions)
+    # Tools (rather than legacy functions) let the model request several calls in one message
+    return prompt | llm.bind_tools(tools)
 
 # Create Researcher and Chart Generator Agents
-research_agent= create_agent(
-    llm,
-    [tavily_tool],
-    system_message="You should provide accurate data for the chart generator to use.",
-)
+def create_agents(llm):
+    """
+    Creates the Researcher and Chart Generator agents on top of the given language model.
+    
+    Returns:
+    - A (research_agent, chart_agent) tuple.
+    """
+    research_agent = create_agent(
+        llm,
+        [get_search_tool(), store_table],
+        system_message="You should provide accurate data for the chart generator to use."
+        " Save tables with store_table and pass on the artifact handle instead of repeating the numbers.",
+    )
+
+    chart_agent = create_agent(
+        llm,
+        [python_repl],
+        system_message="Any charts you display will be visible by the user."
+        " Read tabular data with load_artifact(handle) in python_repl instead of retyping it,"
+        " and take titles and labels from df.attrs['name'] and the column names.",
+    )
+    return research_agent, chart_agent
 
-chart_agent= create_agent(
-    llm,
-    [python_repl],
-    system_message="Any charts you display will be visible by the user.",
-)
+@lru_cache(maxsize=None)
+def get_agents():
+    """Returns the (research_agent, chart_agent) pair built on the shared LLM."""
+    return create_agents(get_llm())
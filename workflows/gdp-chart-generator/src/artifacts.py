@@ -0,0 +1,143 @@
+"""
+Store for tabular data shared between agents and tools by handle.
+
+Only the standard library is used, because the python_repl workers (sandbox.py)
+import this module too.
+"""
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional
+
+# Handles appear in tool output as artifact:<handle>
+ARTIFACT_RE = re.compile(r"\bartifact:([a-z0-9_]+-[0-9a-f]{8})\b")
+
+
+def column_type(values: List[Any]) -> str:
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, bool) for v in present):
+        return "bool"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "int"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "float"
+    return "str"
+
+
+@dataclass
+class Artifact:
+    handle: str
+    name: str
+    schema: Dict[str, str]
+    rows: int
+    preview: List[list]
+
+    def describe(self) -> str:
+        """Compact view for the agents: handle, schema, size and the first rows."""
+        schema = ", ".join(f"{column}: {kind}" for column, kind in self.schema.items())
+        preview = "; ".join(", ".join(str(v) for v in row) for row in self.preview)
+        more = f"; ... {self.rows - len(self.preview)} more" if self.rows > len(self.preview) else ""
+        return f"artifact:{self.handle} ({self.name}, {self.rows} rows) [{schema}] preview: {preview}{more}"
+
+
+# Artifact Store
+class ArtifactStore:
+    """
+    Directory of tables stored as columnar JSON under short content-addressed
+    handles, such as ``gdp-1a2b3c4d``. Storing the same table twice returns the
+    same handle.
+    """
+
+    def __init__(self, root: str = "artifacts", preview_rows: int = 3):
+        self.root = os.path.abspath(root)
+        self.preview_rows = preview_rows
+
+    def _path(self, handle: str) -> str:
+        return os.path.join(self.root, f"{handle}.json")
+
+    def put(self, name: str, table: Any) -> Artifact:
+        """
+        Stores a table given as {column: values}, a list of row dicts or a
+        pandas DataFrame. All columns must have the same length.
+        """
+        columns = to_columns(table)
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        data = json.dumps({"name": name, "columns": columns}, default=str)
+        slug = re.sub(r"[^a-z0-9_]+", "_", name.lower()).strip("_")[:24] or "table"
+        handle = f"{slug}-{hashlib.sha256(data.encode('utf-8')).hexdigest()[:8]}"
+        path = self._path(handle)
+        if not os.path.exists(path):
+            os.makedirs(self.root, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        return self._artifact(handle, name, columns)
+
+    def _read(self, handle: str) -> dict:
+        try:
+            with open(self._path(handle), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(f"Unknown artifact {handle!r}") from None
+
+    def columns(self, handle: str) -> Dict[str, list]:
+        return self._read(handle)["columns"]
+
+    def load(self, handle: str) -> Any:
+        """
+        The table as a pandas DataFrame with the table name in attrs["name"],
+        or as {column: values} without pandas.
+        """
+        data = self._read(handle)
+        try:
+            import pandas
+        except ImportError:
+            return data["columns"]
+        frame = pandas.DataFrame(data["columns"])
+        frame.attrs["name"] = data["name"]
+        return frame
+
+    def get(self, handle: str) -> Artifact:
+        data = self._read(handle)
+        return self._artifact(handle, data["name"], data["columns"])
+
+    def _artifact(self, handle: str, name: str, columns: Mapping[str, list]) -> Artifact:
+        rows = len(next(iter(columns.values()), []))
+        preview = [[values[i] for values in columns.values()] for i in range(min(rows, self.preview_rows))]
+        schema = {column: column_type(values) for column, values in columns.items()}
+        return Artifact(handle, name, schema, rows, preview)
+
+
+def to_columns(table: Any) -> Dict[str, list]:
+    if hasattr(table, "to_dict") and hasattr(table, "columns"):
+        # pandas DataFrame; tolist() turns numpy scalars into plain Python values
+        return {str(column): table[column].tolist() for column in table.columns}
+    if isinstance(table, Mapping):
+        return {str(column): list(values) for column, values in table.items()}
+    if isinstance(table, list) and all(isinstance(row, Mapping) for row in table):
+        names = list(dict.fromkeys(key for row in table for key in row))
+        return {str(name): [row.get(name) for row in table] for name in names}
+    raise TypeError("Expected {column: values}, a list of row dicts or a DataFrame")
+
+
+@lru_cache(maxsize=None)
+def get_artifact_store() -> ArtifactStore:
+    """Returns the process-wide store in ARTIFACT_DIR (default "artifacts")."""
+    return ArtifactStore(os.getenv("ARTIFACT_DIR") or "artifacts")
+
+
+def artifacts_in(text: str, store: Optional[ArtifactStore] = None) -> Dict[str, str]:
+    """{handle: description} for every stored artifact referenced in text."""
+    store = store or get_artifact_store()
+    found = {}
+    for handle in ARTIFACT_RE.findall(text):
+        try:
+            found[handle] = store.get(handle).describe()
+        except KeyError:
+            pass
+    return found
@@ -0,0 +1,171 @@
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+import tokenize
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+HANDLE_PLACEHOLDER = "{{artifact}}"
+LOAD_ARTIFACT_RE = re.compile(r"""load_artifact\(\s*["']([a-z0-9_]+-[0-9a-f]{8})["']""")
+
+# Chart kinds named in a request, and the plotting calls that draw them
+REQUEST_KINDS = [
+    (re.compile(r"\bline\b|\btrend\b"), "line"),
+    (re.compile(r"\bbar\b|\bcolumn chart\b"), "bar"),
+    (re.compile(r"\bscatter\b"), "scatter"),
+    (re.compile(r"\bpie\b"), "pie"),
+    (re.compile(r"\bhistogram\b"), "hist"),
+    (re.compile(r"\barea\b"), "area"),
+]
+CODE_KINDS = {
+    "plot": "line", "bar": "bar", "barh": "bar", "scatter": "scatter", "pie": "pie",
+    "hist": "hist", "fill_between": "area", "stackplot": "area", "area": "area", "line": "line",
+}
+PLOT_CALL_RE = re.compile(r"""kind\s*=\s*["'](\w+)["']|\.(plot|barh?|scatter|pie|hist|fill_between|stackplot|area|line)\(""")
+
+# The user request the running tool calls belong to, so python_repl can key the charts it draws
+current_request: ContextVar[str] = ContextVar("current_request", default="")
+
+
+def request_kind(text: str) -> Optional[str]:
+    """Chart kind asked for in a request, e.g. "line" for "draw a line graph"."""
+    text = text.lower()
+    for pattern, kind in REQUEST_KINDS:
+        if pattern.search(text):
+            return kind
+    return None
+
+
+def code_kind(code: str) -> Optional[str]:
+    """Chart kind drawn by plotting code; an explicit kind= wins over the call name."""
+    matches = PLOT_CALL_RE.findall(code)
+    for explicit, _ in matches:
+        if explicit in CODE_KINDS:
+            return CODE_KINDS[explicit]
+    for _, call in matches:
+        if call:
+            return CODE_KINDS[call]
+    return None
+
+
+def normalize_request(text: str) -> str:
+    """Lowercase words and numbers of a request, so case, punctuation and spacing don't matter."""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def chart_key(kind: str, request: str, schema: Dict[str, str]) -> str:
+    """
+    Cache key: chart kind, the normalized request (a cached program's titles and
+    labels were written for it) and the columns by name and type, in axis order.
+    """
+    digest = hashlib.sha256(normalize_request(request).encode("utf-8")).hexdigest()[:16]
+    columns = ",".join(f"{name}:{dtype}" for name, dtype in schema.items())
+    return f"{kind}:{digest}:{columns}"
+
+
+def code_fingerprint(code: str) -> str:
+    """
+    Hash of the code's token structure with literals, comments and layout
+    removed, so programs that only differ in their data or titles match.
+    """
+    parts = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type in (tokenize.NUMBER, tokenize.STRING):
+                parts.append("<lit>")
+            elif token.type in (tokenize.NAME, tokenize.OP):
+                parts.append(token.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        parts = [" ".join(code.split())]
+    return hashlib.sha256(" ".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def make_template(code: str) -> Optional[Tuple[str, str]]:
+    """
+    (template, handle): the code with its artifact handle as a placeholder, if
+    it reads exactly one artifact, so other data of the same shape can be bound in.
+    """
+    handles = set(LOAD_ARTIFACT_RE.findall(code))
+    if len(handles) != 1:
+        return None
+    handle = handles.pop()
+    return code.replace(handle, HANDLE_PLACEHOLDER), handle
+
+
+def bind_template(template: str, handle: str) -> str:
+    return template.replace(HANDLE_PLACEHOLDER, handle)
+
+
+# Chart Template Cache
+class ChartTemplateCache:
+    """
+    SQLite store of validated chart programs keyed by chart_key. Programs are
+    only stored after they ran without errors and drew a figure, and are only
+    reused once the LLM has written the same program (by code_fingerprint) for
+    the key a second time. One that fails when reused is dropped.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chart_templates ("
+            " key TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " template TEXT NOT NULL,"
+            " confirmed INTEGER NOT NULL DEFAULT 0,"
+            " uses INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT template FROM chart_templates WHERE key = ? AND confirmed = 1", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE chart_templates SET uses = uses + 1 WHERE key = ?", (key,))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, template: str) -> None:
+        fingerprint = code_fingerprint(template)
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint FROM chart_templates WHERE key = ?", (key,)).fetchone()
+            # The same program with other literals is already cached, so it can be reused
+            if row is not None and row[0] == fingerprint:
+                self._conn.execute("UPDATE chart_templates SET confirmed = 1 WHERE key = ?", (key,))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chart_templates (key, fingerprint, template, created_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, fingerprint, template, time.time()),
+                )
+            self._conn.commit()
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chart_templates WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+@lru_cache(maxsize=None)
+def get_chart_cache() -> Optional[ChartTemplateCache]:
+    """
+    Returns the process-wide cache; CHART_CACHE_PATH keeps it on disk and
+    CHART_CACHE=0 turns it off.
+    """
+    if os.getenv("CHART_CACHE", "1") == "0":
+        return None
+    return ChartTemplateCache(os.getenv("CHART_CACHE_PATH") or ":memory:")
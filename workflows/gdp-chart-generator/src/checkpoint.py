@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import zlib
+from functools import lru_cache
+from typing import Any, Iterator, Optional, Tuple
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+# Compact Serialization
+class CompressedSerializer:
+    """
+    Wraps LangGraph's JSON serializer with zlib, which shrinks checkpointed
+    message state several times over. Supports both the typed and the plain
+    serializer protocols, and still reads uncompressed rows.
+    """
+
+    def __init__(self, inner: Any = None, level: int = 6):
+        self.inner = inner or JsonPlusSerializer()
+        self.level = level
+
+    def dumps(self, obj: Any) -> bytes:
+        return zlib.compress(self.inner.dumps(obj), self.level)
+
+    def loads(self, data: bytes) -> Any:
+        try:
+            data = zlib.decompress(data)
+        except zlib.error:
+            pass
+        return self.inner.loads(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        return f"{type_}+zlib", zlib.compress(data, self.level)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith("+zlib"):
+            type_, payload = type_[: -len("+zlib")], zlib.decompress(payload)
+        return self.inner.loads_typed((type_, payload))
+
+
+# Checkpointer
+@lru_cache(maxsize=None)
+def get_checkpointer() -> Optional[SqliteSaver]:
+    """Returns a SQLite checkpointer at CHECKPOINT_PATH, or None when it is unset."""
+    path = os.getenv("CHECKPOINT_PATH")
+    if not path:
+        return None
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False), serde=CompressedSerializer())
+
+
+def get_async_checkpointer():
+    """
+    Async SQLite checkpointer at CHECKPOINT_PATH for graph.astream, or None when
+    it is unset. Create it inside the event loop that will use it.
+    """
+    path = os.getenv("CHECKPOINT_PATH")
+    if not path:
+        return None
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    return AsyncSqliteSaver(aiosqlite.connect(path), serde=CompressedSerializer())
+
+
+def run_config(thread_id: str, checkpoint_id: Optional[str] = None, recursion_limit: int = 150) -> dict:
+    """
+    Graph config for one request. With checkpoint_id the run forks from that
+    earlier step of the thread instead of its latest one.
+    """
+    configurable = {"thread_id": thread_id}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"recursion_limit": recursion_limit, "configurable": configurable}
+
+
+def can_resume(graph, config: dict) -> bool:
+    """True if the thread has a checkpoint with nodes still left to run."""
+    if getattr(graph, "checkpointer", None) is None:
+        return False
+    return bool(graph.get_state(config).next)
+
+
+async def acan_resume(graph, config: dict) -> bool:
+    """can_resume for graphs compiled with an async checkpointer."""
+    if getattr(graph, "checkpointer", None) is None:
+        return False
+    return bool((await graph.aget_state(config)).next)
+
+
+def checkpoint_id(snapshot) -> str:
+    return snapshot.config["configurable"]["checkpoint_id"]
+
+
+def replay(graph, thread_id: str) -> Iterator[Any]:
+    """Yields the saved state snapshots of a thread, oldest first, without running any node."""
+    history = list(graph.get_state_history(run_config(thread_id)))
+    yield from reversed(history)
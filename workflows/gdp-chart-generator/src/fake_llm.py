@@ -0,0 +1,120 @@
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+from tracing import current_agent, current_run
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def load_transcript(path: str) -> Dict[str, List[dict]]:
+    """Reads a transcript written with TRANSCRIPT_PATH into {agent: [replies in order]}."""
+    transcript = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                transcript[entry["agent"]].append(entry)
+    return dict(transcript)
+
+
+# Fake Chat Model for Offline Runs
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that never touches the network, for benchmarking the graph.
+
+    ``script`` maps an agent name to its replies in order. Each reply is a dict
+    with ``content`` and optionally a ``function_call`` ({"name", "arguments"})
+    or OpenAI-style ``tool_calls``, the same shape record_transcript writes, so
+    recorded runs replay as-is.
+    Once an agent's replies run out it answers "FINAL ANSWER". Concurrent runs
+    (see service.py) each replay the script from the start. Every call sleeps
+    for ``latency`` seconds and reports usage_metadata, estimated from text
+    length unless ``prompt_tokens`` or ``completion_tokens`` is set.
+    """
+
+    script: Dict[str, List[dict]] = {}
+    latency: float = 0.0
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    calls: int = 0
+    _replayed: Dict[Tuple[str, str], int] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeChatModel":
+        # Replies are scripted, so the tool schemas are not needed
+        return self
+
+    bind_functions = bind_tools
+
+    def next_reply(self) -> dict:
+        agent = current_agent.get()
+        key = (current_run.get(), agent)
+        with self._lock:
+            self.calls += 1
+            position = self._replayed.get(key, 0)
+            replies = self.script.get(agent, [])
+            if position < len(replies):
+                self._replayed[key] = position + 1
+                return replies[position]
+        return {"content": "FINAL ANSWER"}
+
+    def reply_result(self, messages: List[BaseMessage]) -> ChatResult:
+        reply = self.next_reply()
+        content = reply.get("content") or ""
+        additional_kwargs = {}
+        for key in ("function_call", "tool_calls"):
+            if reply.get(key):
+                additional_kwargs[key] = reply[key]
+
+        prompt_tokens = self.prompt_tokens
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = self.completion_tokens
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(content + json.dumps(additional_kwargs))
+        message = AIMessage(
+            content=content,
+            additional_kwargs=additional_kwargs,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return self.reply_result(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Waits like a network call, without holding a thread
+        await asyncio.sleep(self.latency)
+        return self.reply_result(messages)
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage, FunctionMessage, SystemMessage
+
+SUMMARY_NAME = "history_summary"
+ARCHIVED_RE = re.compile(r"archived as ([0-9a-f]{12})\]$")
+
+
+# Out-of-band Archive
+class MessageArchive:
+    """
+    Content-addressed SQLite store for message content pruned from the graph
+    state. Refs are quoted in the truncated messages and the summary, so the
+    full text can still be looked up with get().
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS archive ("
+            " ref TEXT PRIMARY KEY,"
+            " name TEXT,"
+            " content TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def put(self, content: str, name: Optional[str] = None) -> str:
+        ref = hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO archive (ref, name, content, created_at) VALUES (?, ?, ?, ?)",
+                (ref, name, content, time.time()),
+            )
+            self._conn.commit()
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT content FROM archive WHERE ref = ?", (ref,)).fetchone()
+        return row[0] if row else None
+
+
+def archive_path() -> str:
+    """
+    HISTORY_ARCHIVE_PATH, or a file next to CHECKPOINT_PATH when only that is
+    set, since checkpoints keep the refs to archived messages. Otherwise the
+    archive lives in memory, like the graph state.
+    """
+    path = os.getenv("HISTORY_ARCHIVE_PATH")
+    if path:
+        return path
+    checkpoint = os.getenv("CHECKPOINT_PATH")
+    if checkpoint and checkpoint != ":memory:":
+        return os.path.splitext(checkpoint)[0] + ".archive.sqlite"
+    return ":memory:"
+
+
+@lru_cache(maxsize=None)
+def get_archive() -> MessageArchive:
+    """Returns the process-wide archive at archive_path()."""
+    return MessageArchive(archive_path())
+
+
+# Compaction Policy
+def truncate_tool_output(message: BaseMessage, max_chars: int, archive: MessageArchive) -> BaseMessage:
+    """Shortens a large FunctionMessage to its first max_chars characters, archiving the full text."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if not isinstance(message, FunctionMessage) or len(content) <= max_chars:
+        return message
+    ref = archive.put(content, message.name)
+    return FunctionMessage(
+        content=f"{content[:max_chars]}\n[... {len(content) - max_chars} more characters archived as {ref}]",
+        name=message.name,
+    )
+
+
+def summary_line(message: BaseMessage, archive: MessageArchive) -> str:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    # Truncated tool outputs already point at their full text
+    archived = ARCHIVED_RE.search(content)
+    ref = archived.group(1) if archived else archive.put(content, message.name)
+    text = " ".join(content.split())
+    if len(text) > 160:
+        text = text[:160] + "..."
+    return f"- {message.name or message.type}: {text} (ref {ref})"
+
+
+def compact_messages(
+    messages: List[BaseMessage],
+    window: int = 12,
+    max_tool_chars: int = 2000,
+    max_summary_chars: int = 2000,
+    archive: Optional[MessageArchive] = None,
+) -> List[BaseMessage]:
+    """
+    Bounds the history to the original task, a running summary and the last
+    ``window`` messages. Large tool outputs are truncated, and everything that
+    is cut is kept in the archive. The window never starts with a tool result
+    separated from the message that requested it.
+    """
+    archive = archive or get_archive()
+    messages = [truncate_tool_output(m, max_tool_chars, archive) for m in messages]
+    has_summary = len(messages) > 1 and getattr(messages[1], "name", None) == SUMMARY_NAME
+    body_start = 2 if has_summary else 1
+    if len(messages) - body_start <= window:
+        return messages
+
+    task, body = messages[0], messages[body_start:]
+    cut = len(body) - window
+    while cut > 0 and isinstance(body[cut], FunctionMessage):
+        cut -= 1
+    if cut == 0:
+        return messages
+
+    lines = messages[1].content.splitlines()[1:] if has_summary else []
+    lines += [summary_line(m, archive) for m in body[:cut]]
+    # Keep the most recent lines that fit
+    kept, size = [], 0
+    for line in reversed(lines):
+        size += len(line) + 1
+        if size > max_summary_chars:
+            break
+        kept.append(line)
+    summary = SystemMessage(
+        content="Summary of earlier messages (full text archived by ref):\n" + "\n".join(reversed(kept)),
+        name=SUMMARY_NAME,
+    )
+    return [task, summary] + body[cut:]
+
+
+def bounded_messages(left: List[BaseMessage], right) -> List[BaseMessage]:
+    """
+    AgentState reducer: appends new messages, then applies compact_messages
+    with HISTORY_WINDOW, TOOL_OUTPUT_MAX_CHARS and HISTORY_SUMMARY_MAX_CHARS.
+    """
+    new = list(right) if isinstance(right, (list, tuple)) else [right]
+    return compact_messages(
+        list(left) + new,
+        window=int(os.getenv("HISTORY_WINDOW", "12")),
+        max_tool_chars=int(os.getenv("TOOL_OUTPUT_MAX_CHARS", "2000")),
+        max_summary_chars=int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "2000")),
+    )
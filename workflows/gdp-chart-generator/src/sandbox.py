@@ -0,0 +1,311 @@
+"""
+Pool of warm subprocess workers that run model-written chart code.
+
+Run as a script, this module is the worker itself: it imports the heavy
+plotting libraries once, then executes one code snippet per request in a fresh
+namespace and saves any open matplotlib figures to files. The namespace has
+load_artifact(handle) and save_artifact(name, table) for the artifact store.
+"""
+import atexit
+import contextlib
+import io
+import json
+import os
+import queue
+import resource
+import select
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class ExecutionResult:
+    stdout: str = ""
+    error: Optional[str] = None
+    figures: List[str] = field(default_factory=list)
+    # Descriptions of the artifacts saved by the code
+    artifacts: List[str] = field(default_factory=list)
+
+    def figure_bytes(self) -> List[bytes]:
+        figures = []
+        for path in self.figures:
+            with open(path, "rb") as f:
+                figures.append(f.read())
+        return figures
+
+
+# Variables a worker needs to find Python and its libraries; API keys and the rest stay behind
+WORKER_ENV = ("PATH", "PYTHONPATH", "PYTHONHASHSEED", "HOME", "LANG", "LC_ALL", "TMPDIR")
+
+
+def worker_env() -> dict:
+    return {name: os.environ[name] for name in WORKER_ENV if name in os.environ}
+
+
+# Exit code of a worker that ran out of memory, from the RSS watcher or a MemoryError outside the code
+MEMORY_EXIT_CODE = 137
+
+
+# Worker Process Handle
+class _Worker:
+    def __init__(self, preload: str, max_rss_mb: int, max_address_space_mb: int = 0):
+        self.runs = 0
+        self.ready = False
+        self.process = subprocess.Popen(
+            [
+                sys.executable, os.path.abspath(__file__), "--preload", preload,
+                "--max-rss-mb", str(max_rss_mb), "--max-address-space-mb", str(max_address_space_mb),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=worker_env(),
+        )
+
+    def _read(self, timeout: float) -> Optional[dict]:
+        """Next message from the worker, None on timeout; raises EOFError if it died."""
+        readable, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not readable:
+            return None
+        line = self.process.stdout.readline()
+        if not line:
+            raise EOFError
+        return json.loads(line)
+
+    def wait_ready(self, timeout: float) -> bool:
+        if not self.ready:
+            try:
+                message = self._read(timeout)
+            except EOFError:
+                message = None
+            self.ready = bool(message and message.get("ready"))
+        return self.ready
+
+    def execute(self, code: str, output_dir: str, artifact_dir: str, timeout: float) -> Optional[dict]:
+        self.runs += 1
+        request = {"code": code, "output_dir": output_dir, "artifact_dir": artifact_dir}
+        self.process.stdin.write(json.dumps(request) + "\n")
+        self.process.stdin.flush()
+        return self._read(timeout)
+
+    def exit_code(self, timeout: float = 1.0) -> Optional[int]:
+        """Exit code of a worker whose output has closed, None if it is still running."""
+        try:
+            return self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def rss_mb(self) -> float:
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+        except (OSError, ValueError, IndexError):
+            return 0.0
+
+    def stop(self) -> None:
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+# Worker Pool
+class ReplWorkerPool:
+    """
+    Fixed-size pool of pre-warmed Python worker processes.
+
+    Each execution gets its own namespace, a wall-clock ``timeout`` and an RSS
+    limit of ``max_rss_mb``; the kernel also caps each worker's address space at
+    ``max_address_space_mb`` (0 for no cap). Workers only inherit the variables
+    in WORKER_ENV, so the code cannot read the API keys. A worker that times
+    out, exceeds the limit or has served ``max_runs`` executions is replaced. Figures left open by the code
+    are saved as PNG files under ``output_dir``, so plt.show() is not needed.
+    Artifacts are read from and saved to ``artifact_dir``.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        timeout: float = 60.0,
+        max_rss_mb: int = 1024,
+        max_address_space_mb: int = 4096,
+        max_runs: int = 20,
+        preload: str = "matplotlib,pandas",
+        output_dir: str = "charts",
+        artifact_dir: str = "artifacts",
+    ):
+        self.timeout = timeout
+        self.max_rss_mb = max_rss_mb
+        self.max_address_space_mb = max_address_space_mb
+        self.max_runs = max_runs
+        self.preload = preload
+        self.output_dir = os.path.abspath(output_dir)
+        self.artifact_dir = os.path.abspath(artifact_dir)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        # Workers start importing their libraries right away, in the background
+        for _ in range(size):
+            self._idle.put(self._spawn())
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls) -> "ReplWorkerPool":
+        return cls(
+            size=int(os.getenv("REPL_WORKERS", "2")),
+            timeout=float(os.getenv("REPL_TIMEOUT", "60")),
+            max_rss_mb=int(os.getenv("REPL_MAX_RSS_MB", "1024")),
+            max_address_space_mb=int(os.getenv("REPL_MAX_ADDRESS_SPACE_MB", "4096")),
+            max_runs=int(os.getenv("REPL_MAX_RUNS", "20")),
+            preload=os.getenv("REPL_PRELOAD", "matplotlib,pandas"),
+            output_dir=os.getenv("REPL_OUTPUT_DIR", "charts"),
+            artifact_dir=os.getenv("ARTIFACT_DIR") or "artifacts",
+        )
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self.preload, self.max_rss_mb, self.max_address_space_mb)
+
+    def run(self, code: str, timeout: Optional[float] = None) -> ExecutionResult:
+        timeout = timeout or self.timeout
+        worker = self._idle.get()
+        keep = False
+        try:
+            # Imports normally finish long before the first chart turn
+            if not worker.wait_ready(max(timeout, 60.0)):
+                return ExecutionResult(error="Worker failed to start")
+            output_dir = os.path.join(self.output_dir, uuid.uuid4().hex[:12])
+            try:
+                message = worker.execute(code, output_dir, self.artifact_dir, timeout)
+            except (OSError, EOFError):
+                return ExecutionResult(error=self._exit_error(worker))
+            if message is None:
+                return ExecutionResult(error=f"Execution timed out after {timeout:.0f}s")
+            keep = worker.runs < self.max_runs and worker.rss_mb() < self.max_rss_mb
+            return ExecutionResult(
+                message["stdout"], message.get("error"), message.get("figures", []), message.get("artifacts", [])
+            )
+        finally:
+            self._release(worker, keep)
+
+    def _exit_error(self, worker: _Worker) -> str:
+        code = worker.exit_code()
+        if code == MEMORY_EXIT_CODE:
+            return f"Worker ran out of memory, the limit is {self.max_rss_mb} MB"
+        if code is not None and code < 0:
+            return f"Worker was killed by signal {-code}"
+        return f"Worker exited with code {code}"
+
+    def _release(self, worker: _Worker, keep: bool) -> None:
+        with self._lock:
+            if self._closed:
+                worker.stop()
+                return
+            if not keep:
+                worker.stop()
+                worker = self._spawn()
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                return
+
+
+# Worker Entry Point
+def _watch_rss(max_rss_mb: int) -> None:
+    """Exits the worker as soon as its resident memory passes the limit."""
+    page_mb = os.sysconf("SC_PAGE_SIZE") / 2**20
+    while True:
+        try:
+            with open("/proc/self/statm") as f:
+                rss_mb = int(f.read().split()[1]) * page_mb
+        except OSError:
+            return
+        if rss_mb > max_rss_mb:
+            os._exit(MEMORY_EXIT_CODE)
+        time.sleep(0.05)
+
+
+def _save_figures(output_dir: str) -> List[str]:
+    if "matplotlib.pyplot" not in sys.modules:
+        return []
+    plt = sys.modules["matplotlib.pyplot"]
+    paths = []
+    for number in plt.get_fignums():
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"figure_{number}.png")
+        plt.figure(number).savefig(path)
+        paths.append(path)
+    plt.close("all")
+    return paths
+
+
+def worker_main(preload: str, max_rss_mb: int, max_address_space_mb: int = 0) -> None:
+    # Cap the virtual memory first, so a runaway allocation fails inside the worker
+    if max_address_space_mb:
+        resource.setrlimit(resource.RLIMIT_AS, (max_address_space_mb * 2**20, max_address_space_mb * 2**20))
+    # Keep the real stdout for the protocol; stray output from the code goes to stderr
+    protocol = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    for name in filter(None, preload.split(",")):
+        try:
+            __import__(name.strip())
+            if name.strip() == "matplotlib":
+                __import__("matplotlib.pyplot")
+        except ImportError:
+            pass
+    threading.Thread(target=_watch_rss, args=(max_rss_mb,), daemon=True).start()
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    protocol.flush()
+
+    from artifacts import ArtifactStore
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        store = ArtifactStore(request["artifact_dir"])
+        saved = []
+
+        def save_artifact(name, table):
+            artifact = store.put(name, table)
+            saved.append(artifact.describe())
+            return artifact.handle
+
+        stdout = io.StringIO()
+        error = None
+        try:
+            with contextlib.redirect_stdout(stdout):
+                namespace = {"__name__": "__main__", "load_artifact": store.load, "save_artifact": save_artifact}
+                exec(request["code"], namespace)
+        except BaseException:
+            error = traceback.format_exc(limit=3)
+        try:
+            figures = _save_figures(request["output_dir"])
+        except Exception:
+            figures = []
+        reply = {"stdout": stdout.getvalue(), "error": error, "figures": figures, "artifacts": saved}
+        protocol.write(json.dumps(reply) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--preload", default="")
+    parser.add_argument("--max-rss-mb", type=int, default=1024)
+    parser.add_argument("--max-address-space-mb", type=int, default=0)
+    args = parser.parse_args()
+    try:
+        worker_main(args.preload, args.max_rss_mb, args.max_address_space_mb)
+    except MemoryError:
+        os._exit(MEMORY_EXIT_CODE)
@@ -0,0 +1,175 @@
+import json
+import os
+import sqlite3
+import string
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.tools import StructuredTool
+from tracing import get_tracer
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and edge-punctuation-insensitive form of a search query."""
+    return " ".join(query.lower().split()).strip(string.punctuation + " ")
+
+
+# Search Result Cache
+class SearchCache:
+    """
+    SQLite store of search results keyed by normalized query.
+
+    Entries older than ``ttl_seconds`` are treated as misses, and the table is
+    pruned to ``max_entries`` rows, least recently used first. The default
+    path ":memory:" only lasts for the process.
+    """
+
+    def __init__(self, path: str = ":memory:", ttl_seconds: float = 86400, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " query TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, query: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM results WHERE query = ?", (query,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE query = ?", (now, query))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, query: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (query, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (query, json.dumps(value), now, now),
+            )
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM results WHERE query IN ("
+                " SELECT query FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+# Search Backends
+def tavily_backend(max_results: int = 5) -> Callable[[str], Any]:
+    """Live Tavily search; the client is only created when this backend is used."""
+    from langchain_community.tools.tavily_search import TavilySearchResults
+
+    client = TavilySearchResults(max_results=max_results)
+    return lambda query: client.invoke({"query": query})
+
+
+def fixture_backend(path: str) -> Callable[[str], Any]:
+    """
+    Offline search backed by a JSON file of {query: results}. Queries are
+    matched after normalize_query; unknown queries return the "*" entry, if any.
+    """
+    with open(path, encoding="utf-8") as f:
+        fixtures = json.load(f)
+    default = fixtures.pop("*", [])
+    fixtures = {normalize_query(query): results for query, results in fixtures.items()}
+    return lambda query: fixtures.get(normalize_query(query), default)
+
+
+# Cached Search
+class CachedSearch:
+    """
+    Serves searches from a SearchCache and coalesces concurrent identical
+    queries, so only one of them reaches the backend. Only successful (list)
+    results are cached; Tavily reports errors as strings.
+    """
+
+    def __init__(self, backend: Callable[[str], Any], cache: SearchCache):
+        self.backend = backend
+        self.cache = cache
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, query: str) -> Any:
+        key = normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            with get_tracer().span("search_cache", kind="cache", cache_hits=1):
+                return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = self.backend(query)
+            if isinstance(result, list):
+                self.cache.set(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+def build_search_tool(max_results: int = 5) -> StructuredTool:
+    """
+    Builds the Researcher's search tool from the environment.
+
+    SEARCH_BACKEND=fixture with SEARCH_FIXTURES=<file.json> searches offline;
+    otherwise Tavily is used. SEARCH_CACHE_PATH persists results across runs,
+    SEARCH_CACHE_TTL (seconds) and SEARCH_CACHE_MAX_ENTRIES bound the cache.
+    The tool keeps Tavily's name and description, so prompts do not change.
+    """
+    if os.getenv("SEARCH_BACKEND", "tavily").lower() == "fixture":
+        backend = fixture_backend(os.environ["SEARCH_FIXTURES"])
+    else:
+        backend = tavily_backend(max_results)
+    cache = SearchCache(
+        os.getenv("SEARCH_CACHE_PATH") or ":memory:",
+        ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL", "86400")),
+        max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000")),
+    )
+    search = CachedSearch(backend, cache)
+
+    def tavily_search_results_json(query: str) -> Any:
+        return search(query)
+
+    return StructuredTool.from_function(
+        func=tavily_search_results_json,
+        name="tavily_search_results_json",
+        description=(
+            "A search engine optimized for comprehensive, accurate, and trusted results."
+            " Useful for when you need to answer questions about current events."
+            " Input should be a search query."
+        ),
+    )
@@ -0,0 +1,186 @@
+import asyncio
+import contextlib
+import json
+import os
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Optional
+
+from langchain_core.messages import HumanMessage
+from checkpoint import acan_resume, run_config
+from workflow_common.gateway import get_gateway
+from workflow_common.governor import RunGovernor
+from tracing import current_governor, current_run, get_tracer, percentile
+
+
+class ServiceOverloaded(Exception):
+    """Raised when a request arrives while the wait queue is full."""
+
+
+# Chart Service
+class ChartService:
+    """
+    Runs chart requests concurrently on one compiled graph with graph.astream.
+
+    At most ``max_concurrency`` runs execute at once and up to ``max_queue``
+    more wait for a slot; beyond that, submit() raises ServiceOverloaded so
+    callers can back off. Every run has its own thread ID, and all runs share
+    the graph's agents, and so one LLM client. Create it inside the event loop.
+    """
+
+    def __init__(self, graph, max_concurrency: int = 4, max_queue: int = 32, recursion_limit: int = 150):
+        self.graph = graph
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.recursion_limit = recursion_limit
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.latencies: deque = deque(maxlen=1000)
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    def from_env(cls, graph) -> "ChartService":
+        return cls(
+            graph,
+            max_concurrency=int(os.getenv("SERVICE_MAX_CONCURRENCY", "4")),
+            max_queue=int(os.getenv("SERVICE_MAX_QUEUE", "32")),
+        )
+
+    async def submit(self, task: str, thread_id: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Queues a chart request and yields its progress events: "queued",
+        "started", one "node" event per finished graph node, then "done" or
+        "error". Leaving the iteration early cancels the run.
+        """
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            self._update_gauges()
+            raise ServiceOverloaded(f"{self.waiting} requests already waiting")
+        thread_id = thread_id or uuid.uuid4().hex
+        received = time.perf_counter()
+        self.waiting += 1
+        self._update_gauges()
+        try:
+            yield {"event": "queued", "thread_id": thread_id, "queue_depth": self.waiting}
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        self._update_gauges()
+        events: asyncio.Queue = asyncio.Queue()
+        run = asyncio.ensure_future(self._run(task, thread_id, received, events))
+        try:
+            yield {"event": "started", "thread_id": thread_id, "queued_s": time.perf_counter() - received}
+            while True:
+                event = await events.get()
+                yield event
+                if event["event"] in ("done", "error"):
+                    return
+        finally:
+            run.cancel()
+            self.latencies.append(time.perf_counter() - received)
+            self.running -= 1
+            self._slots.release()
+            self._update_gauges()
+
+    async def _run(self, task: str, thread_id: str, received: float, events: asyncio.Queue) -> None:
+        # Runs in its own task, so this only tags this request's spans and LLM calls
+        current_run.set(thread_id)
+        governor = RunGovernor()
+        current_governor.set(governor)
+        try:
+            config = run_config(thread_id, recursion_limit=self.recursion_limit)
+            inputs = {"messages": [HumanMessage(content=task)]}
+            if await acan_resume(self.graph, config):
+                inputs = None
+            async for step in self.graph.astream(inputs, config):
+                for node, update in step.items():
+                    events.put_nowait({"event": "node", "thread_id": thread_id, "node": node, **summarize(update)})
+            self.completed += 1
+            events.put_nowait({
+                "event": "done",
+                "thread_id": thread_id,
+                "seconds": time.perf_counter() - received,
+                "stopped": governor.stop_reason,
+            })
+        except Exception as e:
+            self.failed += 1
+            events.put_nowait({"event": "error", "thread_id": thread_id, "error": repr(e)})
+
+    def _update_gauges(self) -> None:
+        tracer = get_tracer()
+        tracer.set_gauge("service_queue_depth", self.waiting)
+        tracer.set_gauge("service_running", self.running)
+        tracer.set_gauge("service_rejected_total", self.rejected)
+        get_gateway().export_metrics(tracer)
+
+    def stats(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "p50_s": percentile(latencies, 0.5),
+            "p95_s": percentile(latencies, 0.95),
+            "p99_s": percentile(latencies, 0.99),
+        }
+
+
+def summarize(update: Any) -> dict:
+    """Short, JSON-safe view of a node's state update for progress events."""
+    messages = (update or {}).get("messages") or []
+    if not messages:
+        return {}
+    last = messages[-1]
+    content = last.content if isinstance(last.content, str) else str(last.content)
+    return {"name": getattr(last, "name", None), "content": content[:500]}
+
+
+# JSON-lines Server
+async def handle_client(service: ChartService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Serves one connection. Each line is a request, {"task": ..., "thread_id": ...}
+    or {"stats": true}; the reply is a stream of JSON-line events.
+    """
+    async def send(event: dict) -> None:
+        writer.write((json.dumps(event, default=str) + "\n").encode("utf-8"))
+        # Waits while the client is slow to read
+        await writer.drain()
+
+    try:
+        while line := await reader.readline():
+            try:
+                request = json.loads(line)
+            except ValueError:
+                await send({"event": "error", "error": "invalid JSON"})
+                continue
+            if request.get("stats"):
+                await send({"event": "stats", **service.stats()})
+                continue
+            if not request.get("task"):
+                await send({"event": "error", "error": "missing task"})
+                continue
+            try:
+                # Closing the stream right away cancels the run if the client goes away
+                async with contextlib.aclosing(service.submit(request["task"], request.get("thread_id"))) as events:
+                    async for event in events:
+                        await send(event)
+            except ServiceOverloaded as e:
+                await send({"event": "rejected", "error": str(e)})
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service: ChartService, host: str = "127.0.0.1", port: int = 8765) -> None:
+    server = await asyncio.start_server(lambda r, w: handle_client(service, r, w), host, port)
+    async with server:
+        await server.serve_forever()
@@ -1,14 +1,24 @@
 import os
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_experimental.utilities import PythonREPL
+from functools import lru_cache
 from langchain_core.tools import tool
-from typing import Annotated
+from typing import Annotated, Any, Dict, List
+from artifacts import get_artifact_store
+from chart_cache import chart_key, code_kind, current_request, get_chart_cache, make_template
+from search import build_search_tool
+from sandbox import ReplWorkerPool
 
 # Set API keys for Tavily 
 TAVILY_API_KEY = os.getenv('TAVILY_API_KEY', '<Your Default Tavily API Key>')
 
-tavily_tool = TavilySearchResults(max_results=5) # Tavily Search Tool
-repl = PythonREPL() # Python Tool (REPL)
+@lru_cache(maxsize=None)
+def get_search_tool():
+    """Returns the Tavily Search Tool, cached (see search.py), built on first use from the SEARCH_* settings."""
+    return build_search_tool(max_results=5)
+
+@lru_cache(maxsize=None)
+def get_repl_pool() -> ReplWorkerPool:
+    """Returns the Python tool's pool of sandboxed workers (see sandbox.py), started on first use."""
+    return ReplWorkerPool.from_env()
 
 @tool
 def python_repl(code: Annotated[str, "The python code to execute to generate your chart."]):
@@ -16,6 +26,9 @@ def python_repl(code: Annotated[str, "The python code to execute to generate you
     Executes the provided Python code and returns the result. 
     This tool runs Python code and outputs the result, 
     which is useful for generating charts or performing calculations.
+    Open matplotlib figures are saved to files automatically, so plt.show() is not needed.
+    load_artifact(handle) returns a stored table as a DataFrame, and save_artifact(name, table)
+    stores one and returns its handle.
 
     Args:
     - code: A string containing the Python code to be executed.
@@ -23,10 +36,44 @@ def python_repl(code: Annotated[str, "The python code to execute to generate you
     Returns:
     - A message indicating success or failure of execution, along with the result or error.
     """
+    result = get_repl_pool().run(code)
+    if result.error:
+        return f"Failed to execute. Error: {result.error}"
+    if result.figures:
+        remember_chart(code)
+    figures = f"\\\\nFigures: {', '.join(result.figures)}" if result.figures else ""
+    artifacts = f"\\\\nSaved: {'; '.join(result.artifacts)}" if result.artifacts else ""
+    return f"Succesfully executed:\\\\n`python\\\\\\\\n{code}\\\\\\\\n`\\\\nStdout: {result.stdout}{figures}{artifacts}"
+
+def remember_chart(code):
+    """Caches chart code that drew a figure from one artifact as a template for that chart kind, request and data."""
+    cache, made, kind, request = get_chart_cache(), make_template(code), code_kind(code), current_request.get()
+    if cache is None or made is None or kind is None or not request:
+        return
+    template, handle = made
+    try:
+        schema = get_artifact_store().get(handle).schema
+    except KeyError:
+        return
+    cache.put(chart_key(kind, request, schema), template)
+
+@tool
+def store_table(
+    name: Annotated[str, "A short name for the table, e.g. malaysia_gdp."],
+    columns: Annotated[Dict[str, List[Any]], "The table as {column name: list of values}, all of the same length."],
+):
+    """
+    Stores a table in the shared artifact store and returns its handle with the schema and a preview.
+    Pass the handle to other assistants instead of repeating the data;
+    in python_repl, load_artifact(handle) returns the table as a pandas DataFrame.
+    """
     try:
-        result = repl.run(code)
-    except BaseException as e:
-        return f"Failed to execute. Error: {repr(e)}"
-    return f"Succesfully executed:\\\\n`python\\\\\\\\n{code}\\\\\\\\n`\\\\nStdout: {result}"
+        artifact = get_artifact_store().put(name, columns)
+    except (TypeError, ValueError) as e:
+        return f"Failed to store table. Error: {e}"
+    return f"Stored {artifact.describe()}"
 
-tools = [tavily_tool, python_repl]  
+@lru_cache(maxsize=None)
+def get_tools():
+    """Returns every tool the agents can call."""
+    return [get_search_tool(), python_repl, store_table]
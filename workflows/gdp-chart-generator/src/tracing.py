@@ -0,0 +1,24 @@
+import os
+from functools import lru_cache
+
+from workflow_common.governor import current_governor  # noqa: F401
+from workflow_common.tracing import Tracer, bind_context, current_agent, current_run, percentile, run_scope  # noqa: F401
+
+
+@lru_cache(maxsize=None)
+def get_tracer() -> Tracer:
+    """
+    Returns the process-wide tracer.
+
+    Set TRACE_PATH for a JSONL span log and METRICS_PATH for a Prometheus textfile.
+    """
+    return Tracer(trace_path=os.getenv("TRACE_PATH"), metrics_path=os.getenv("METRICS_PATH"), prefix="gdp_chart")
+
+
+def message_token_counts(message) -> tuple:
+    """Reads (prompt, completion) token counts from an LLM result message, if reported."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
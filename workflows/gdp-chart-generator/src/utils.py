@@ -1,48 +1,157 @@
+import asyncio
 import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Any, NamedTuple
 from langchain_core.messages import (
+    AIMessage,
     FunctionMessage,
     HumanMessage,
 )
-from langgraph.prebuilt.tool_executor import ToolExecutor, ToolInvocation
-from tools import tools
+from tools import get_repl_pool, get_tools
+from artifacts import artifacts_in, get_artifact_store
+from chart_cache import bind_template, chart_key, current_request, get_chart_cache, request_kind
+from tracing import bind_context, current_governor, get_tracer, message_token_counts
+
+
+# Tool Execution
+class ToolInvocation(NamedTuple):
+    tool: str
+    tool_input: Any
+
+
+# Tools by name and one worker pool shared by every tool_node call, created on first use
+@lru_cache(maxsize=None)
+def get_tools_by_name():
+    return {tool.name: tool for tool in get_tools()}
+
+
+@lru_cache(maxsize=None)
+def get_tool_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_MAX_WORKERS", "8")))
+
+
+# Per-tool timeouts in seconds; other tools use TOOL_TIMEOUT
+TOOL_TIMEOUTS = {
+    "tavily_search_results_json": 30.0,
+    "python_repl": 120.0,
+}
+
+
+def tool_timeout(name: str) -> float:
+    if name in TOOL_TIMEOUTS:
+        return TOOL_TIMEOUTS[name]
+    return float(os.getenv("TOOL_TIMEOUT", "60"))
+
+
+def tool_invocations(message):
+    """
+    Builds a ToolInvocation for every tool call in an assistant message, reading
+    parallel ``tool_calls`` first and the legacy single ``function_call`` otherwise.
+    """
+    calls = [call["function"] for call in message.additional_kwargs.get("tool_calls") or []]
+    if not calls and "function_call" in message.additional_kwargs:
+        calls = [message.additional_kwargs["function_call"]]
+    actions = []
+    for call in calls:
+        tool_input = json.loads(call["arguments"] or "{}")
+        # We can pass single-arg inputs by value
+        if len(tool_input) == 1 and "__arg1" in tool_input:
+            tool_input = next(iter(tool_input.values()))
+        actions.append(ToolInvocation(tool=call["name"], tool_input=tool_input))
+    return actions
+
+
+def invoke_tool(action: ToolInvocation):
+    tools_by_name = get_tools_by_name()
+    tool = tools_by_name.get(action.tool)
+    if tool is None:
+        return f"{action.tool} is not a valid tool, try one of [{', '.join(tools_by_name)}]."
+    return tool.invoke(action.tool_input)
+
+
+def run_tool(action):
+    with get_tracer().span(action.tool, kind="tool"):
+        response = invoke_tool(action)
+    if action.tool == "python_repl" and str(response).startswith("Succesfully executed"):
+        # Count charts for the tokens-per-chart figure
+        get_tracer().add_outputs(1)
+    return response
 
 
 # Tool Node Function
 def tool_node(state):
     """
-    Executes the tool based on the last message in the state and returns the tool's result.
+    Executes every tool call in the last message concurrently and returns all results in one step.
     
     Args:
     - state: The current state, which contains the messages and other information.
     
     Returns:
-    - A dictionary containing the result from the tool execution, formatted as a message.
+    - A dictionary with one FunctionMessage per tool call, in the order the calls were made,
+      and the artifacts those calls stored or referenced.
     """
     messages = state["messages"]
     # Based on the continue condition
-    # we know the last message involves a function call
-    last_message = messages[-1]
-    # We construct an ToolInvocation from the function_call
-    tool_input = json.loads(
-        last_message.additional_kwargs["function_call"]["arguments"]
-    )
-    # We can pass single-arg inputs by value
-    if len(tool_input) == 1 and "__arg1" in tool_input:
-        tool_input = next(iter(tool_input.values()))
-    tool_name = last_message.additional_kwargs["function_call"]["name"]
-    action = ToolInvocation(
-        tool=tool_name,
-        tool_input=tool_input,
-    )
-    # We call the tool_executor and get back a response
-    tool_executor = ToolExecutor(tools)
-    response = tool_executor.invoke(action)
-    # We use the response to create a FunctionMessage
-    function_message = FunctionMessage(
-        content=f"{tool_name} response: {str(response)}", name=action.tool
-    )
+    # we know the last message involves one or more tool calls
+    actions = tool_invocations(messages[-1])
+    started = time.monotonic()
+    token = current_request.set(str(messages[0].content))
+    try:
+        futures = [get_tool_pool().submit(bind_context(run_tool), action) for action in actions]
+    finally:
+        current_request.reset(token)
+    function_messages = []
+    for action, future in zip(actions, futures):
+        timeout = tool_timeout(action.tool)
+        try:
+            response = future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+        except FutureTimeoutError:
+            # The worker thread cannot be interrupted; its late result is discarded
+            response = f"Failed to execute. Error: timed out after {timeout:.0f}s"
+        except Exception as e:
+            response = f"Failed to execute. Error: {repr(e)}"
+        function_messages.append(
+            FunctionMessage(content=f"{action.tool} response: {str(response)}", name=action.tool)
+        )
     # We return a list, because this will get added to the existing list
-    return {"messages": [function_message]}
+    return {"messages": function_messages, "artifacts": message_artifacts(function_messages)}
+
+
+async def atool_node(state):
+    """
+    tool_node for graph.astream: waits on the shared worker pool without blocking the event loop.
+    """
+    actions = tool_invocations(state["messages"][-1])
+
+    async def call(action):
+        timeout = tool_timeout(action.tool)
+        future = asyncio.wrap_future(get_tool_pool().submit(bind_context(run_tool), action))
+        try:
+            response = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            response = f"Failed to execute. Error: timed out after {timeout:.0f}s"
+        except Exception as e:
+            response = f"Failed to execute. Error: {repr(e)}"
+        return FunctionMessage(content=f"{action.tool} response: {str(response)}", name=action.tool)
+
+    token = current_request.set(str(state["messages"][0].content))
+    try:
+        function_messages = list(await asyncio.gather(*(call(action) for action in actions)))
+    finally:
+        current_request.reset(token)
+    return {"messages": function_messages, "artifacts": message_artifacts(function_messages)}
+
+
+def message_artifacts(messages):
+    """{handle: description} of the artifacts stored or referenced by tool results."""
+    artifacts = {}
+    for message in messages:
+        artifacts.update(artifacts_in(message.content))
+    return artifacts
 
 # Router Logic
 def router(state):
@@ -54,11 +163,16 @@ def router(state):
     
     Returns:
     - A string representing the next step in the workflow, such as "continue", "call_tool", or "end".
+      The run also ends when the current RunGovernor reports a spent budget or a repeated step.
     """
     # This is the router
     messages = state["messages"]
     last_message = messages[-1]
-    if "function_call" in last_message.additional_kwargs:
+    governor = current_governor.get()
+    if governor is not None and governor.check(*message_step(state.get("sender"), last_message)) is not None:
+        # Out of budget or going in circles; the state so far is the result
+        return "end"
+    if "function_call" in last_message.additional_kwargs or last_message.additional_kwargs.get("tool_calls"):
         # The previus agent is invoking a tool
         return "call_tool"
     if "FINAL ANSWER" in last_message.content:
@@ -67,8 +181,72 @@ def router(state):
     return "continue"
 
 
+def message_step(sender, message):
+    """What identifies a step for loop detection: who said what, and which tools it called."""
+    kwargs = message.additional_kwargs
+    calls = [(call["function"]["name"], call["function"]["arguments"]) for call in kwargs.get("tool_calls") or []]
+    return sender, message.content, kwargs.get("function_call"), calls
+
+
+# Transcript Recording
+_transcript_lock = threading.Lock()
+
+def record_transcript(name, message):
+    """
+    Appends an agent's reply to TRANSCRIPT_PATH (if set) as one JSON line, so the
+    run can be replayed offline with FakeChatModel.
+    """
+    path = os.getenv("TRANSCRIPT_PATH")
+    if not path:
+        return
+    entry = {
+        "agent": name,
+        "content": message.content,
+        "function_call": message.additional_kwargs.get("function_call"),
+        "tool_calls": message.additional_kwargs.get("tool_calls"),
+    }
+    with _transcript_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+# Cached Charts
+def cached_chart(state):
+    """
+    Draws the chart from a cached template when the request and the columns of
+    the latest artifact match one, which skips the Chart Generator's LLM
+    turn. Only applies to a hand-off from the Researcher; returns None otherwise,
+    or when the template fails, so the LLM takes over.
+    """
+    cache = get_chart_cache()
+    artifacts = state.get("artifacts") or {}
+    if cache is None or not artifacts or state.get("sender") != "Researcher":
+        return None
+    request = str(state["messages"][0].content)
+    kind = request_kind(request)
+    if kind is None:
+        return None
+    handle = list(artifacts)[-1]
+    try:
+        key = chart_key(kind, request, get_artifact_store().get(handle).schema)
+    except KeyError:
+        return None
+    template = cache.get(key)
+    if template is None:
+        return None
+    with get_tracer().span("chart_cache", kind="cache", cache_hits=1):
+        result = get_repl_pool().run(bind_template(template, handle))
+    if result.error or not result.figures:
+        cache.discard(key)
+        return None
+    get_tracer().add_outputs(1)
+    return AIMessage(
+        content=f"FINAL ANSWER\nChart of artifact:{handle} drawn from a cached template.\n"
+        f"Figures: {', '.join(result.figures)}"
+    )
+
+
 # Agent Node Execution
-def agent_node(state, agent, name):
+def agent_node(state, agent, name, shortcut=None):
     """
     Executes an agent's action and updates the state with the agent's response.
     
@@ -76,11 +254,38 @@ def agent_node(state, agent, name):
     - state: The current state of the workflow.
     - agent: The agent to invoke.
     - name: The name of the agent.
+    - shortcut: Optional function of the state that may return the reply without calling the agent.
     
     Returns:
     - A dictionary containing the updated state with the agent's message.
     """
-    result = agent.invoke(state)
+    tracer = get_tracer()
+    with tracer.span(name):
+        result = shortcut(state) if shortcut else None
+        if result is None:
+            with tracer.span("llm", kind="llm") as span:
+                result = agent.invoke(state)
+                span["prompt_tokens"], span["completion_tokens"] = message_token_counts(result)
+    return agent_update(result, name)
+
+
+async def aagent_node(state, agent, name, shortcut=None):
+    """
+    agent_node for graph.astream: awaits the model, so many runs can share one event loop.
+    """
+    tracer = get_tracer()
+    with tracer.span(name):
+        result = await asyncio.to_thread(shortcut, state) if shortcut else None
+        if result is None:
+            with tracer.span("llm", kind="llm") as span:
+                result = await agent.ainvoke(state)
+                span["prompt_tokens"], span["completion_tokens"] = message_token_counts(result)
+    return agent_update(result, name)
+
+
+def agent_update(result, name):
+    """Turns an agent's reply into the state update shared by agent_node and aagent_node."""
+    record_transcript(name, result)
     # We convert the agent output into a format that is suitable to append to the global state
     if isinstance(result, FunctionMessage):
         pass
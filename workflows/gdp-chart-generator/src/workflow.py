@@ -1,11 +1,14 @@
 import functools
 import operator
-from typing import Annotated, Sequence, TypedDict
+from typing import Annotated, Dict, Sequence, TypedDict
 from typing_extensions import TypedDict
 from langgraph.graph import END, StateGraph
 from langchain_core.messages import BaseMessage
-from utils import agent_node, tool_node, router
-from agents import research_agent, chart_agent
+from langchain_core.runnables import RunnableLambda
+from utils import aagent_node, agent_node, atool_node, cached_chart, tool_node, router
+from history import bounded_messages
+from checkpoint import get_checkpointer
+from agents import get_agents
 
 # Define Agent State Structure
 class AgentState(TypedDict):
@@ -14,35 +17,59 @@ class AgentState(TypedDict):
     It includes the messages exchanged and the sender of each message.
     
     Attributes:
-    - messages: A sequence of messages exchanged between agents.
+    - messages: A sequence of messages exchanged between agents, bounded to the task,
+      a running summary and a sliding window (see history.py).
     - sender: The name of the agent who sent the message.
+    - artifacts: Tables in the artifact store referenced so far, as {handle: schema and preview}.
     """
-    messages: Annotated[Sequence[BaseMessage], operator.add]
+    messages: Annotated[Sequence[BaseMessage], bounded_messages]
     sender: str
+    artifacts: Annotated[Dict[str, str], operator.or_]
 
-# Workflow Creation
-research_node = functools.partial(agent_node, agent=research_agent, name="Researcher")
-chart_node = functools.partial(agent_node, agent=chart_agent, name="Chart Generator")
+# Graph Construction
+def build_graph(research_agent, chart_agent, checkpointer=None):
+    """
+    Builds and compiles the Researcher / Chart Generator workflow around the given agents.
+    With a checkpointer, the state is saved after every node under the run's thread_id.
+    
+    Returns:
+    - The compiled graph.
+    """
+    # Workflow Creation
+    # Each node has a sync and an async variant, used by graph.stream and graph.astream respectively
+    def node(fn, afn, **kwargs):
+        return RunnableLambda(functools.partial(fn, **kwargs), afunc=functools.partial(afn, **kwargs))
+
+    research_node = node(agent_node, aagent_node, agent=research_agent, name="Researcher")
+    # Repeat chart requests are drawn from a cached template without an LLM turn
+    chart_node = node(agent_node, aagent_node, agent=chart_agent, name="Chart Generator", shortcut=cached_chart)
+    call_tool_node = RunnableLambda(tool_node, afunc=atool_node)
+
+    # Building the Graph
+    workflow = StateGraph(AgentState)
+    workflow.add_node("Researcher", research_node)
+    workflow.add_node("Chart Generator", chart_node)
+    workflow.add_node("call_tool", call_tool_node)
 
-# Building the Graph
-workflow = StateGraph(AgentState)
-workflow.add_node("Researcher", research_node)
-workflow.add_node("Chart Generator", chart_node)
-workflow.add_node("call_tool", tool_node)
+    # Define Conditional Edges hat will route messages as per the conditions fulfilled
+    workflow.add_conditional_edges(
+        "Researcher", router, {"continue": "Chart Generator", "call_tool": "call_tool", "end": END}
+    )
+    workflow.add_conditional_edges(
+        "Chart Generator", router, {"continue": "Researcher", "call_tool": "call_tool", "end": END}
+    )
+    workflow.add_conditional_edges(
+        "call_tool",
+        lambda x: x["sender"],
+        {"Researcher": "Researcher", "Chart Generator": "Chart Generator"},
+    )
 
-# Define Conditional Edges hat will route messages as per the conditions fulfilled
-workflow.add_conditional_edges(
-    "Researcher", router, {"continue": "Chart Generator", "call_tool": "call_tool", "end": END}
-)
-workflow.add_conditional_edges(
-    "Chart Generator", router, {"continue": "Researcher", "call_tool": "call_tool", "end": END}
-)
-workflow.add_conditional_edges(
-    "call_tool",
-    lambda x: x["sender"],
-    {"Researcher": "Researcher", "Chart Generator": "Chart Generator"},
-)
+    # Set Entry Point and Compile Graph
+    workflow.set_entry_point("Researcher")
+    return workflow.compile(checkpointer=checkpointer)
 
-# Set Entry Point and Compile Graph
-workflow.set_entry_point("Researcher")
-graph = workflow.compile()
\ No newline at end of file
+@functools.lru_cache(maxsize=None)
+def get_graph():
+    """Returns the graph with the default agents, compiled with the checkpointer from CHECKPOINT_PATH."""
+    research_agent, chart_agent = get_agents()
+    return build_graph(research_agent, chart_agent, checkpointer=get_checkpointer())